@@ -0,0 +1,116 @@
+"""Partition plant_hist by month of added_at
+
+Revision ID: 5b2e8c41d7a3
+Revises: 69d724eb9c27
+Create Date: 2026-10-18 09:00:12.512345
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8c41d7a3'
+down_revision: Union[str, None] = '69d724eb9c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def next_month(month: date) -> date:
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE plant_hist RENAME TO plant_hist_unpartitioned")
+    op.execute(
+        "ALTER TABLE plant_hist_unpartitioned "
+        "RENAME CONSTRAINT plant_hist_pkey TO plant_hist_unpartitioned_pkey"
+    )
+    op.execute("ALTER INDEX ix_plant_hist_id RENAME TO ix_plant_hist_unpartitioned_id")
+    # partition key has to be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE plant_hist (
+            id INTEGER NOT NULL DEFAULT nextval('plant_hist_id_seq'),
+            temperature FLOAT NOT NULL,
+            lux FLOAT NOT NULL,
+            humidity FLOAT NOT NULL,
+            added_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            plant_id INTEGER REFERENCES plant (id),
+            CONSTRAINT plant_hist_pkey PRIMARY KEY (id, added_at)
+        ) PARTITION BY RANGE (added_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE plant_hist_id_seq OWNED BY plant_hist.id")
+    op.create_index(op.f('ix_plant_hist_id'), 'plant_hist', ['id'], unique=False)
+    op.create_index(
+        'ix_plant_hist_plant_id_added_at',
+        'plant_hist',
+        ['plant_id', sa.text('added_at DESC')],
+        unique=False,
+    )
+    op.execute("CREATE TABLE plant_hist_default PARTITION OF plant_hist DEFAULT")
+
+    first_added_at = (
+        op.get_bind()
+        .execute(sa.text("SELECT min(added_at) FROM plant_hist_unpartitioned"))
+        .scalar()
+    )
+    month = (first_added_at or datetime.utcnow()).date().replace(day=1)
+    last_month = datetime.utcnow().date().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last_month = next_month(last_month)
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE plant_hist_y{month.year}m{month.month:02d} "
+            f"PARTITION OF plant_hist FOR VALUES FROM ('{month.isoformat()}') "
+            f"TO ('{next_month(month).isoformat()}')"
+        )
+        month = next_month(month)
+
+    op.execute(
+        "INSERT INTO plant_hist (id, temperature, lux, humidity, added_at, plant_id) "
+        "SELECT id, temperature, lux, humidity, COALESCE(added_at, now()), plant_id "
+        "FROM plant_hist_unpartitioned"
+    )
+    op.drop_table('plant_hist_unpartitioned')
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE plant_hist RENAME TO plant_hist_partitioned")
+    op.execute(
+        "ALTER TABLE plant_hist_partitioned "
+        "RENAME CONSTRAINT plant_hist_pkey TO plant_hist_partitioned_pkey"
+    )
+    op.drop_index(
+        'ix_plant_hist_plant_id_added_at', table_name='plant_hist_partitioned'
+    )
+    op.drop_index(op.f('ix_plant_hist_id'), table_name='plant_hist_partitioned')
+    op.execute(
+        """
+        CREATE TABLE plant_hist (
+            id INTEGER NOT NULL DEFAULT nextval('plant_hist_id_seq'),
+            temperature FLOAT NOT NULL,
+            lux FLOAT NOT NULL,
+            humidity FLOAT NOT NULL,
+            added_at TIMESTAMP WITHOUT TIME ZONE,
+            plant_id INTEGER REFERENCES plant (id),
+            CONSTRAINT plant_hist_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE plant_hist_id_seq OWNED BY plant_hist.id")
+    op.create_index(op.f('ix_plant_hist_id'), 'plant_hist', ['id'], unique=False)
+    op.execute(
+        "INSERT INTO plant_hist (id, temperature, lux, humidity, added_at, plant_id) "
+        "SELECT id, temperature, lux, humidity, added_at, plant_id "
+        "FROM plant_hist_partitioned"
+    )
+    # drops partitions as well
+    op.drop_table('plant_hist_partitioned')
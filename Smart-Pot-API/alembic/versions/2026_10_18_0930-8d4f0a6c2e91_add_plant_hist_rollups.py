@@ -0,0 +1,61 @@
+"""Add hourly and daily plant history rollups
+
+Revision ID: 8d4f0a6c2e91
+Revises: 5b2e8c41d7a3
+Create Date: 2026-10-18 09:30:41.108230
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4f0a6c2e91'
+down_revision: Union[str, None] = '5b2e8c41d7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = {'plant_hist_hourly': 'hour', 'plant_hist_daily': 'day'}
+SENSORS = ('temperature', 'lux', 'humidity')
+
+
+def upgrade() -> None:
+    for table_name, resolution in ROLLUP_TABLES.items():
+        op.create_table(
+            table_name,
+            sa.Column('plant_id', sa.Integer(), nullable=False),
+            sa.Column('bucket', sa.DateTime(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            *(
+                sa.Column(f'{sensor}_{aggregate}', sa.Float(), nullable=False)
+                for sensor in SENSORS
+                for aggregate in ('min', 'max', 'sum')
+            ),
+            sa.ForeignKeyConstraint(
+                ['plant_id'],
+                ['plant.id'],
+            ),
+            sa.PrimaryKeyConstraint('plant_id', 'bucket'),
+        )
+        aggregates = ', '.join(
+            f'{function}({sensor})'
+            for sensor in SENSORS
+            for function in ('min', 'max', 'sum')
+        )
+        columns = ', '.join(
+            f'{sensor}_{aggregate}'
+            for sensor in SENSORS
+            for aggregate in ('min', 'max', 'sum')
+        )
+        op.execute(
+            f"INSERT INTO {table_name} (plant_id, bucket, count, {columns}) "
+            f"SELECT plant_id, date_trunc('{resolution}', added_at), count(*), "
+            f"{aggregates} FROM plant_hist WHERE plant_id IS NOT NULL "
+            f"GROUP BY plant_id, date_trunc('{resolution}', added_at)"
+        )
+
+
+def downgrade() -> None:
+    for table_name in ROLLUP_TABLES:
+        op.drop_table(table_name)
@@ -0,0 +1,36 @@
+"""Add user token version and blacklisted token jti
+
+Revision ID: 3c7a9e2f5b14
+Revises: 8d4f0a6c2e91
+Create Date: 2026-10-18 10:00:12.503117
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3c7a9e2f5b14'
+down_revision: Union[str, None] = '8d4f0a6c2e91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user',
+        sa.Column(
+            'token_version', sa.Integer(), server_default=sa.text('0'), nullable=False
+        ),
+    )
+    op.add_column('blacklisttoken', sa.Column('jti', sa.String(), nullable=True))
+    op.create_index(
+        op.f('ix_blacklisttoken_jti'), 'blacklisttoken', ['jti'], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_blacklisttoken_jti'), table_name='blacklisttoken')
+    op.drop_column('blacklisttoken', 'jti')
+    op.drop_column('user', 'token_version')
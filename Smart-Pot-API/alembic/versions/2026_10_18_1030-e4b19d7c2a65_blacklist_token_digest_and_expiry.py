@@ -0,0 +1,58 @@
+"""Index blacklisted tokens by digest and add their expiry
+
+Revision ID: e4b19d7c2a65
+Revises: 3c7a9e2f5b14
+Create Date: 2026-10-18 10:30:27.841905
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b19d7c2a65'
+down_revision: Union[str, None] = '3c7a9e2f5b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# exp of existing tokens is unknown, refresh token lives the longest (7 days)
+EXISTING_TOKENS_LIFETIME = "interval '7 days'"
+
+
+def upgrade() -> None:
+    op.add_column(
+        'blacklisttoken', sa.Column('token_digest', sa.String(length=64), nullable=True)
+    )
+    op.add_column(
+        'blacklisttoken', sa.Column('expires_at', sa.DateTime(), nullable=True)
+    )
+    op.execute(
+        "UPDATE blacklisttoken SET "
+        "token_digest = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        f"expires_at = invalidated_at + {EXISTING_TOKENS_LIFETIME}"
+    )
+    op.alter_column('blacklisttoken', 'token_digest', nullable=False)
+    op.alter_column('blacklisttoken', 'expires_at', nullable=False)
+    op.drop_index('ix_blacklisttoken_token', table_name='blacklisttoken')
+    op.create_index(
+        'ix_blacklisttoken_token_digest',
+        'blacklisttoken',
+        ['token_digest'],
+        unique=False,
+        postgresql_using='hash',
+    )
+    op.create_index(
+        op.f('ix_blacklisttoken_expires_at'),
+        'blacklisttoken',
+        ['expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_blacklisttoken_expires_at'), table_name='blacklisttoken')
+    op.drop_index('ix_blacklisttoken_token_digest', table_name='blacklisttoken')
+    op.create_index('ix_blacklisttoken_token', 'blacklisttoken', ['token'], unique=True)
+    op.drop_column('blacklisttoken', 'expires_at')
+    op.drop_column('blacklisttoken', 'token_digest')
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.endpoints.tags import Tag
+from ...core.dependencies import get_async_db
+from ...crud.async_crud_plants import update_plant, update_plants_batch
+from ...schemas.message import Message
+from ...schemas.plant import Plant, PlantBatchUpdate, PlantUpdate
+
+# async device ingest endpoints, they don't take threads from the threadpool
+router_ingest = APIRouter(prefix="/api/v1/plants", tags=[Tag.PLANTS])
+
+
+@router_ingest.patch(
+    "/update-plant", status_code=status.HTTP_200_OK, response_model=Plant
+)
+async def update_existing_plant(
+    updated_plant: PlantUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    updated_plant = await update_plant(db, updated_plant)
+    return updated_plant
+
+
+@router_ingest.patch(
+    "/update-plants-batch",
+    status_code=status.HTTP_200_OK,
+    response_model=Message,
+    description="Devices can upload buffered readings in one request. Every "
+    "reading needs its own last_updated timestamp",
+)
+async def update_existing_plants_batch(
+    plants_batch: PlantBatchUpdate, db: AsyncSession = Depends(get_async_db)
+):
+    message = await update_plants_batch(db, plants_batch)
+    return message
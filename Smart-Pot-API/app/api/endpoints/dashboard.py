@@ -0,0 +1,30 @@
+from typing import Annotated, List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from ...api.endpoints.tags import Tag
+from ...core.dependencies import get_read_db
+from ...crud.crud_dashboard import get_user_dashboard
+from ...crud.crud_users import UserSnapshot, get_current_active_user_snapshot
+from ...schemas.dashboard import DashboardPlant
+
+router = APIRouter(prefix="/api/v1/dashboard", tags=[Tag.DASHBOARD])
+
+
+@router.get(
+    "/",
+    status_code=status.HTTP_200_OK,
+    response_model=List[DashboardPlant],
+    description="Current readings, threshold status and 24 hours sparkline of "
+    "every user's plant",
+)
+def get_dashboard(
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    db: Session = Depends(get_read_db),
+):
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
+        )
+    return get_user_dashboard(db, current_user.id)
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import EmailStr, parse_obj_as
 
 from ...api.endpoints.tags import Tag
-from ...core.dependencies import get_db
+from ...core.dependencies import get_db, get_read_db
 from ...core.security import create_device_token
 from ...crud.crud_devices import (
     create_new_device,
@@ -31,7 +31,7 @@ def get_current_user_devices(
 
 
 @router.get("/{device_id}", status_code=200, response_model=Device)
-def read_device_by_id(device_id: str, db=Depends(get_db)) -> Device:
+def read_device_by_id(device_id: str, db=Depends(get_read_db)) -> Device:
     device = get_device_by_id(db=db, device_id=device_id)
     if device is None:
         raise HTTPException(
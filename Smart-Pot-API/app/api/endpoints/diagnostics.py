@@ -0,0 +1,39 @@
+from typing import Annotated, Any, Dict
+
+from fastapi import APIRouter, Depends, status
+
+from ...api.endpoints.tags import Tag
+from ...core.password_executor import password_executor
+from ...core.security import access_token_cache
+from ...core.settings import settings
+from ...crud.crud_users import UserSnapshot, get_current_active_user_snapshot
+from ...db.plant_hist_buffer import plant_hist_buffer
+from ...db.pool import pool_status
+from ...db.replica import replica_engine, replica_lag_monitor, replica_pool_stats
+from ...db.session import engine, pool_stats
+
+router = APIRouter(prefix="/api/v1/diagnostics", tags=[Tag.DIAGNOSTICS])
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+def get_diagnostics(
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)]
+) -> Dict[str, Any]:
+    diagnostics = {
+        "access_token_cache": access_token_cache.stats,
+        "plant_hist_buffer": plant_hist_buffer.stats,
+        "password_executor": password_executor.stats,
+        "database_pool": pool_status(engine, pool_stats),
+    }
+    if replica_engine is not None:
+        diagnostics["replica_database_pool"] = pool_status(
+            replica_engine, replica_pool_stats
+        )
+        diagnostics["replica_lag"] = replica_lag_monitor.stats
+    if settings.DATABASE_ASYNC:
+        from ...db.async_session import async_pool_stats, get_async_engine
+
+        diagnostics["async_database_pool"] = pool_status(
+            get_async_engine().sync_engine, async_pool_stats
+        )
+    return diagnostics
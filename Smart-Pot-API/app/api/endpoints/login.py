@@ -12,17 +12,19 @@ from ...core.security import (
     create_access_token,
     create_refresh_token,
     create_reset_password_token,
+    decode_access_token,
     destroy_access_token,
     get_hashed_password,
     oauth2_scheme,
-    verify_access_token,
 )
 from ...core.settings import settings
 from ...crud.crud_users import (
     control_user_activity,
     create_new_user,
     get_current_user,
+    get_token_user,
     get_user_by_email,
+    revoke_user_tokens,
     user_authentication,
 )
 from ...crud.email_connection import MailConnection
@@ -57,9 +59,9 @@ def login_access_token(
         )
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, user=user
     )
-    refresh_token = create_refresh_token(subject=user.email)
+    refresh_token = create_refresh_token(subject=user.email, user=user)
     control_user_activity(db=db, user=user, state=True)
     return {
         "access_token": access_token,
@@ -77,6 +79,7 @@ def logout(
     current_user.is_active = False
     db.commit()
     destroy_access_token(db=db, token=token, current_user=current_user)
+    revoke_user_tokens(db, current_user)
     return {"message": "User logged out successfully"}
 
 
@@ -97,13 +100,14 @@ def get_refresh_token(
     refresh_token: RefreshToken, db: Session = Depends(get_db)
 ) -> Any:
     try:
-        user_email = verify_access_token(refresh_token.token)
-        if user_email is None:
+        claims = decode_access_token(refresh_token.token)
+        user = get_token_user(db, claims)
+        if user is None and "uid" in claims:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token is invalid or has been invalidated (logged out).",
             )
-        if not get_user_by_email(db=db, user_email=user_email):
+        if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User with this email not found",
@@ -111,8 +115,8 @@ def get_refresh_token(
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Refresh token has expired")
 
-    new_access_token = create_access_token(subject=user_email)
-    new_refresh_token = create_refresh_token(subject=user_email)
+    new_access_token = create_access_token(subject=user.email, user=user)
+    new_refresh_token = create_refresh_token(subject=user.email, user=user)
     return {
         "access_token": new_access_token,
         "refresh_token": new_refresh_token,
@@ -125,13 +129,14 @@ def reset_password(
     user_change_password: UserChangePassword,
     db: Session = Depends(get_db),
 ) -> Any:
-    user_email = verify_access_token(user_change_password.token)
-    if user_email is None:
+    claims = decode_access_token(user_change_password.token)
+    # reset token is used only once, password change bumps token version
+    user = get_token_user(db, claims)
+    if user is None and "uid" in claims:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token is invalid or has been invalidated (logged out).",
         )
-    user = get_user_by_email(db=db, user_email=user_email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -139,7 +144,7 @@ def reset_password(
         )
     hashed_password = get_hashed_password(user_change_password.new_password)
     user.hashed_password = hashed_password
-    db.commit()
+    revoke_user_tokens(db, user)
     db.refresh(user)
     return {"message": "Password updated successfully"}
 
@@ -161,7 +166,7 @@ async def recover_password(
     )
     mail_connection = MailConnection(email)
     response = await mail_connection.send_email_resetting_password()
-    token = create_reset_password_token(subject=user_email)
+    token = create_reset_password_token(subject=user_email, user=user)
     if response.status_code == 200:
         return {"reset_password_token": token, "token_type": "bearer"}
     else:
@@ -1,11 +1,34 @@
-from typing import Annotated, Any, List, Union
+from datetime import datetime
+from typing import Annotated, Any, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from ...api.endpoints.tags import Tag
-from ...core.dependencies import get_db
+from ...core.dependencies import get_db, get_read_db
+from ...core.export import MEDIA_TYPES, export_chunks
+from ...core.pagination import (
+    NEXT_CURSOR_HEADER,
+    HistCursor,
+    decode_cursor,
+    encode_cursor,
+)
+from ...core.responses import ORJSONUTCResponse
+from ...core.settings import settings
+from ...crud.crud_plant_hist import (
+    PLANT_HIST_COLUMNS,
+    convert_local_datetime_to_utc,
+    get_plant_hist_buckets,
+    get_plant_hist_downsampled_by_date,
+    get_plant_hist_downsampled_limit,
+    get_plant_hist_rollups_by_date,
+    get_plant_hist_rollups_limit,
+    plant_hist_to_columns,
+    stream_plant_hist_batches,
+)
 from ...crud.crud_plants import (
+    convert_string_date_to_datetime,
     create_new_plant,
     delete_user_plant,
     get_current_user_plants,
@@ -13,16 +36,115 @@ from ...crud.crud_plants import (
     get_user_historical_plant_data_by_date,
     get_user_historical_plant_data_limit,
     get_user_plant_by_id,
+    get_user_plant_ids,
     update_plant,
     update_plant_name,
+    update_plants_batch,
+)
+from ...crud.crud_users import (
+    UserSnapshot,
+    get_current_active_user,
+    get_current_active_user_snapshot,
 )
-from ...crud.crud_users import get_current_active_user
 from ...models.user import User
 from ...schemas.message import Message
-from ...schemas.plant import ChangePlantName, Plant, PlantCreate, PlantHist, PlantUpdate
+from ...schemas.plant import (
+    ChangePlantName,
+    Plant,
+    PlantBatchUpdate,
+    PlantCreate,
+    PlantHist,
+    PlantHistBucket,
+    PlantHistRollup,
+    PlantUpdate,
+)
+from ...schemas.utils.export_format import ExportFormat
+from ...schemas.utils.hist_format import HistFormat
+from ...schemas.utils.hist_resolution import HistResolution
 
 router = APIRouter(prefix="/api/v1/plants", tags=[Tag.PLANTS])
 router_historical = APIRouter(prefix="/api/v1/hist-plants", tags=[Tag.PLANTS])
+# device ingest endpoints, replaced by async ones when DATABASE_ASYNC is on
+router_ingest = APIRouter(prefix="/api/v1/plants", tags=[Tag.PLANTS])
+
+MAX_POINTS_QUERY = Query(
+    default=None,
+    ge=3,
+    le=10000,
+    description="Downsample readings to about max_points per sensor for charts",
+)
+
+
+LIMIT_QUERY = Query(
+    default=...,
+    gt=0,
+    le=settings.HIST_LIMIT_MAX,
+    description="Number of latest readings, or of hour or day buckets",
+)
+PAGE_SIZE_QUERY = Query(
+    default=settings.HIST_PAGE_SIZE, ge=1, le=settings.HIST_PAGE_SIZE_MAX
+)
+HIST_FORMAT_QUERY = Query(default=HistFormat.ROWS, alias="format")
+CURSOR_QUERY = Query(
+    default=None,
+    description=f"Value of {NEXT_CURSOR_HEADER} header from the previous page",
+)
+
+
+def verify_raw_history_options(
+    resolution: HistResolution, max_points: Optional[int], hist_format: HistFormat
+) -> None:
+    if resolution == HistResolution.RAW:
+        return
+    if max_points is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_points can be used only with raw resolution",
+        )
+    if hist_format == HistFormat.COLUMNAR:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="columnar format can be used only with raw resolution",
+        )
+
+
+def verify_cursor_options(
+    cursor: Optional[str], max_points: Optional[int], resolution: HistResolution
+) -> Optional[HistCursor]:
+    if cursor is None:
+        return None
+    if max_points is not None or resolution != HistResolution.RAW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor can be used only with raw resolution without max_points",
+        )
+    return decode_cursor(cursor)
+
+
+def set_next_cursor(
+    response: Response,
+    plant_hist: List,
+    page_size: int,
+    remaining: Optional[int] = None,
+) -> None:
+    """Add cursor of the next page when the page is full and limit is not reached"""
+    if len(plant_hist) < page_size or remaining == 0:
+        return
+    last_row = plant_hist[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        HistCursor(last_row.added_at, last_row.id, remaining)
+    )
+
+
+def format_plant_hist(plant_hist: List, response: Response, hist_format: HistFormat):
+    """Return rows for response model or build columnar response skipping it"""
+    if hist_format == HistFormat.ROWS:
+        return plant_hist
+    columnar_response = ORJSONUTCResponse(plant_hist_to_columns(plant_hist))
+    next_cursor = response.headers.get(NEXT_CURSOR_HEADER)
+    if next_cursor is not None:
+        columnar_response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return columnar_response
 
 
 @router.get("/", status_code=status.HTTP_200_OK, response_model=List[Plant])
@@ -33,8 +155,8 @@ def get_current_user_plants(plants: Annotated[List, Depends(get_current_user_pla
 @router.get("/{plant_id}", status_code=status.HTTP_200_OK, response_model=Plant)
 def read_plant_by_id(
     plant_id: int,
-    user: Annotated[User, Depends(get_current_active_user)],
-    db: Session = Depends(get_db),
+    user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    db: Session = Depends(get_read_db),
 ) -> Plant:
     if not user:
         raise HTTPException(
@@ -68,12 +190,28 @@ def create_new_plant_for_current_user(
     return new_plant
 
 
-@router.patch("/update-plant", status_code=status.HTTP_200_OK, response_model=Plant)
+@router_ingest.patch(
+    "/update-plant", status_code=status.HTTP_200_OK, response_model=Plant
+)
 def update_existing_plant(updated_plant: PlantUpdate, db: Session = Depends(get_db)):
     updated_plant = update_plant(db, updated_plant)
     return updated_plant
 
 
+@router_ingest.patch(
+    "/update-plants-batch",
+    status_code=status.HTTP_200_OK,
+    response_model=Message,
+    description="Devices can upload buffered readings in one request. Every "
+    "reading needs its own last_updated timestamp",
+)
+def update_existing_plants_batch(
+    plants_batch: PlantBatchUpdate, db: Session = Depends(get_db)
+):
+    message = update_plants_batch(db, plants_batch)
+    return message
+
+
 @router.patch(
     "/update-plant-name/{plant_id}",
     status_code=status.HTTP_200_OK,
@@ -102,51 +240,229 @@ def delete_plant(
 @router_historical.get(
     "/get-by-limit/{plant_id}",
     status_code=status.HTTP_200_OK,
-    response_model=List[PlantHist],
+    response_model=Union[List[PlantHist], List[PlantHistRollup]],
+    description="With hour or day resolution returns aggregated buckets "
+    "instead of readings. With max_points readings are downsampled with "
+    "Largest-Triangle-Three-Buckets. Raw readings are returned in pages of "
+    f"page_size, next page is requested with cursor from {NEXT_CURSOR_HEADER} "
+    "header. Columnar format returns lists of timestamps and sensor values",
 )
 def get_hist_plant_by_limit(
     plant_id: int,
-    limit: int,
-    current_user: Annotated[User, Depends(get_current_active_user)],
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    limit: int = LIMIT_QUERY,
+    resolution: HistResolution = HistResolution.RAW,
+    max_points: Optional[int] = MAX_POINTS_QUERY,
+    page_size: int = PAGE_SIZE_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    hist_format: HistFormat = HIST_FORMAT_QUERY,
+    db: Session = Depends(get_read_db),
 ):
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
         )
-    plant_hist = get_user_historical_plant_data_limit(db, plant_id, limit)
+    if get_user_plant_by_id(db, plant_id, current_user.id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cannot find plant"
+        )
+    verify_raw_history_options(resolution, max_points, hist_format)
+    hist_cursor = verify_cursor_options(cursor, max_points, resolution)
+    if max_points is not None:
+        plant_hist = get_plant_hist_downsampled_limit(db, plant_id, limit, max_points)
+    elif resolution == HistResolution.RAW:
+        remaining = limit
+        if hist_cursor is not None and hist_cursor.remaining is not None:
+            remaining = hist_cursor.remaining
+        page_size = min(page_size, remaining)
+        plant_hist = get_user_historical_plant_data_limit(
+            db,
+            plant_id,
+            page_size,
+            hist_cursor,
+        )
+        set_next_cursor(response, plant_hist, page_size, remaining - len(plant_hist))
+    else:
+        plant_hist = get_plant_hist_rollups_limit(db, plant_id, resolution, limit)
     if plant_hist is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cannot find historical data for that plant",
         )
-    return plant_hist
+    return format_plant_hist(plant_hist, response, hist_format)
 
 
 @router_historical.get(
     "/get-by-date/{plant_id}",
     status_code=status.HTTP_200_OK,
-    response_model=List[PlantHist],
+    response_model=Union[List[PlantHist], List[PlantHistRollup]],
     description="User need to provide start_date in format YYYY-MM-DD, but end_date "
-    "is date now",
+    "is date now. With hour or day resolution returns aggregated buckets instead "
+    "of readings. With max_points readings are downsampled with "
+    "Largest-Triangle-Three-Buckets. Raw readings are returned in pages of "
+    f"page_size, next page is requested with cursor from {NEXT_CURSOR_HEADER} "
+    "header. Columnar format returns lists of timestamps and sensor values",
 )
 def get_hist_plant_by_date(
     plant_id: int,
     start_date: str,
-    current_user: Annotated[User, Depends(get_current_active_user)],
+    response: Response,
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
     end_date: Union[str, None] = None,
-    db: Session = Depends(get_db),
+    resolution: HistResolution = HistResolution.RAW,
+    max_points: Optional[int] = MAX_POINTS_QUERY,
+    page_size: int = PAGE_SIZE_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    hist_format: HistFormat = HIST_FORMAT_QUERY,
+    db: Session = Depends(get_read_db),
 ):
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
         )
-    plant_hist = get_user_historical_plant_data_by_date(
-        db, plant_id, start_date, end_at=end_date
-    )
+    if get_user_plant_by_id(db, plant_id, current_user.id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cannot find plant"
+        )
+    verify_raw_history_options(resolution, max_points, hist_format)
+    hist_cursor = verify_cursor_options(cursor, max_points, resolution)
+    if resolution == HistResolution.RAW and max_points is None:
+        plant_hist = get_user_historical_plant_data_by_date(
+            db,
+            plant_id,
+            start_date,
+            end_at=end_date,
+            cursor=hist_cursor,
+            page_size=page_size,
+        )
+        set_next_cursor(response, plant_hist, page_size)
+    else:
+        start_at = convert_string_date_to_datetime(start_date)
+        if end_date is None:
+            end_at = datetime.utcnow()
+        else:
+            end_at = convert_string_date_to_datetime(end_date)
+        if max_points is not None:
+            plant_hist = get_plant_hist_downsampled_by_date(
+                db, plant_id, start_at, end_at, max_points
+            )
+        else:
+            plant_hist = get_plant_hist_rollups_by_date(
+                db, plant_id, resolution, start_at, end_at
+            )
     if plant_hist is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cannot find historical data for that plant",
         )
-    return plant_hist
+    return format_plant_hist(plant_hist, response, hist_format)
+
+
+@router_historical.get(
+    "/get-aggregated/{plant_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=List[PlantHistBucket],
+    description="Returns min, max, mean and 95th percentile of every sensor in "
+    "buckets of bucket_minutes. Dates in format YYYY-MM-DD and bucket boundaries "
+    "are in user's timezone, end_date is date now by default",
+)
+def get_hist_plant_aggregated(
+    plant_id: int,
+    start_date: str,
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    end_date: Union[str, None] = None,
+    bucket_minutes: int = Query(default=60, ge=1, le=60 * 24 * 31),
+    db: Session = Depends(get_read_db),
+):
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
+        )
+    if get_user_plant_by_id(db, plant_id, current_user.id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cannot find plant"
+        )
+    user_timezone = (current_user.timezone or "UTC").strip().replace(" ", "_")
+    start_at = convert_local_datetime_to_utc(
+        convert_string_date_to_datetime(start_date), user_timezone
+    )
+    if end_date is None:
+        end_at = datetime.utcnow()
+    else:
+        end_at = convert_local_datetime_to_utc(
+            convert_string_date_to_datetime(end_date), user_timezone
+        )
+    return get_plant_hist_buckets(
+        db, plant_id, start_at, end_at, bucket_minutes, user_timezone
+    )
+
+
+def plant_hist_export_response(
+    db: Session,
+    plant_ids: List[int],
+    filename: str,
+    export_format: ExportFormat,
+    gzip: bool,
+) -> StreamingResponse:
+    batches = stream_plant_hist_batches(db, plant_ids, settings.EXPORT_BATCH_SIZE)
+    filename = f"{filename}.{export_format.value}"
+    media_type = MEDIA_TYPES[export_format]
+    if gzip:
+        filename = f"{filename}.gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        export_chunks(batches, PLANT_HIST_COLUMNS, export_format, gzip=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router_historical.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    description="Streams history of all user's plants as NDJSON, CSV, Parquet or "
+    "Arrow IPC file, optionally compressed with gzip",
+)
+def export_hist_user_plants(
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    gzip: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
+        )
+    plant_ids = get_user_plant_ids(db, current_user.id)
+    return plant_hist_export_response(
+        db, plant_ids, f"user_{current_user.id}_history", export_format, gzip
+    )
+
+
+@router_historical.get(
+    "/export/{plant_id}",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    description="Streams whole plant history as NDJSON, CSV, Parquet or Arrow IPC "
+    "file, optionally compressed with gzip",
+)
+def export_hist_plant(
+    plant_id: int,
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    export_format: ExportFormat = Query(default=ExportFormat.NDJSON, alias="format"),
+    gzip: bool = False,
+    db: Session = Depends(get_read_db),
+):
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User is not active"
+        )
+    if get_user_plant_by_id(db, plant_id, current_user.id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cannot find plant"
+        )
+    return plant_hist_export_response(
+        db, [plant_id], f"plant_{plant_id}_history", export_format, gzip
+    )
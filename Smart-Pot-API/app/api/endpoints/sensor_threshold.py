@@ -4,13 +4,17 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from ...api.endpoints.tags import Tag
-from ...core.dependencies import get_db
+from ...core.dependencies import get_db, get_read_db
 from ...crud.crud_sensor_treshold import (
     get_current_user_sensor_thresholds,
     get_sensor_threshold_by_id,
     update_user_sensor_threshold,
 )
-from ...crud.crud_users import get_current_active_user
+from ...crud.crud_users import (
+    UserSnapshot,
+    get_current_active_user,
+    get_current_active_user_snapshot,
+)
 from ...models.user import User
 from ...schemas.sensor_threshold import SensorThreshold, SensorThresholdUpdate
 
@@ -36,8 +40,10 @@ def get_current_user_thresholds(
 def get_user_threshold_by_id(
     plant_id: int,
     threshold_id: str,
-    current_active_user: Annotated[User, Depends(get_current_active_user)],
-    db: Session = Depends(get_db),
+    current_active_user: Annotated[
+        UserSnapshot, Depends(get_current_active_user_snapshot)
+    ],
+    db: Session = Depends(get_read_db),
 ):
     if not current_active_user:
         raise HTTPException(
@@ -8,3 +8,5 @@ class Tag(str, Enum):
     DEVICES = "Devices"
     HEALTHCHECK = "Healthcheck"
     THRESHOLDS = "Sensor thresholds"
+    DIAGNOSTICS = "Diagnostics"
+    DASHBOARD = "Dashboard"
@@ -4,11 +4,14 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from ...api.endpoints.tags import Tag
-from ...core.dependencies import get_db
+from ...core.dependencies import get_db, get_read_db
 from ...core.security import verify_access_token
 from ...crud.crud_users import (
+    UserSnapshot,
     delete_user,
     get_current_active_user,
+    get_current_active_user_snapshot,
+    get_user_with_plants,
     update_user_language,
     update_user_timezone,
     user_authentication,
@@ -21,8 +24,11 @@ router = APIRouter(prefix="/api/v1/users", tags=[Tag.USERS])
 
 
 @router.get("/me", response_model=User)
-def get_current_user(current_user: Annotated[User, Depends(get_current_active_user)]):
-    return current_user
+def get_current_user(
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    db: Session = Depends(get_read_db),
+):
+    return get_user_with_plants(db, current_user.id)
 
 
 @router.patch("/update-language", response_model=Message, status_code=200)
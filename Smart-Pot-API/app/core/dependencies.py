@@ -1,5 +1,6 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
+from ..db.replica import get_read_session
 from ..db.session import SessionLocal
 
 
@@ -9,3 +10,20 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+def get_read_db() -> Generator:
+    """Session of read only endpoints, on replica when it's set and up to date"""
+    db = get_read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator:
+    # sqlalchemy asyncio extension is loaded only when async mode is used
+    from ..db.async_session import get_async_sessionmaker
+
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Select indices of points kept by Largest-Triangle-Three-Buckets.
+
+    x has to be sorted ascending. First and last points are always kept, every
+    other point is the one from its bucket, which makes the largest triangle
+    with the previously kept point and the average of the next bucket.
+    """
+    size = len(x)
+    if max_points >= size or max_points < 3:
+        return np.arange(size)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # bucket i contains points from edges[i] to edges[i + 1], both ends of the
+    # series are buckets with one point
+    bucket_size = (size - 2) / (max_points - 2)
+    edges = (np.arange(max_points - 1) * bucket_size).astype(np.int64) + 1
+    counts = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x[: size - 1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[: size - 1], edges[:-1]) / counts, y[-1])
+
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, size - 1
+    selected = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # doubled triangle area, constant factor does not change the argmax
+        areas = np.abs(
+            (x[selected] - average_x[bucket + 1]) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (average_y[bucket + 1] - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+    return indices
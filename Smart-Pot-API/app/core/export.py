@@ -0,0 +1,157 @@
+import csv
+import io
+import zlib
+from typing import Any, Iterable, Iterator, List, Sequence
+
+import orjson
+from sqlalchemy.engine import Row
+
+from ..schemas.utils.export_format import ExportFormat
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.file",
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write only file, which keeps written bytes until they are drained.
+
+    Arrow writers ask for the position to put offsets in the file footer, so
+    the position counts all bytes ever written, not only buffered ones.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.position = 0
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def encode_ndjson(
+    batches: Iterable[List[Row]], columns: Sequence[str]
+) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(
+            orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_NAIVE_UTC) + b"\n"
+            for row in batch
+        )
+
+
+def encode_csv(batches: Iterable[List[Row]], columns: Sequence[str]) -> Iterator[bytes]:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield output.getvalue().encode()
+        output.seek(0)
+        output.truncate()
+
+
+def _arrow_schema(columns: Sequence[str]):
+    import pyarrow as pa  # imported on demand, it is heavy for cold starts
+
+    arrow_types = {
+        "id": pa.int64(),
+        "temperature": pa.float32(),
+        "lux": pa.float32(),
+        "humidity": pa.float32(),
+        "added_at": pa.timestamp("us", tz="UTC"),
+        "plant_id": pa.int32(),
+    }
+    return pa.schema([pa.field(name, arrow_types[name]) for name in columns])
+
+
+def _record_batches(batches: Iterable[List[Row]], schema) -> Iterator[Any]:
+    import pyarrow as pa
+
+    for batch in batches:
+        if batch:
+            yield pa.record_batch(
+                [
+                    pa.array(values, type=field.type)
+                    for values, field in zip(zip(*batch), schema)
+                ],
+                schema=schema,
+            )
+
+
+def encode_parquet(
+    batches: Iterable[List[Row]], columns: Sequence[str]
+) -> Iterator[bytes]:
+    """Write every batch as a row group of compressed Parquet file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(
+        pa.PythonFile(sink, mode="w"), schema, compression="zstd"
+    ) as writer:
+        for record_batch in _record_batches(batches, schema):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def encode_arrow(
+    batches: Iterable[List[Row]], columns: Sequence[str]
+) -> Iterator[bytes]:
+    """Write batches as Arrow IPC file, which pandas reads almost without copying"""
+    import pyarrow as pa
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    with pa.ipc.new_file(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for record_batch in _record_batches(batches, schema):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+ENCODERS = {
+    ExportFormat.NDJSON: encode_ndjson,
+    ExportFormat.CSV: encode_csv,
+    ExportFormat.PARQUET: encode_parquet,
+    ExportFormat.ARROW: encode_arrow,
+}
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress chunks on the fly into one gzip stream"""
+    compressor = zlib.compressobj(wbits=31)  # 31 writes gzip header and trailer
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(
+    batches: Iterable[List[Row]],
+    columns: Sequence[str],
+    export_format: ExportFormat,
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    chunks = ENCODERS[export_format](batches, columns)
+    if gzip:
+        return gzip_chunks(chunks)
+    return chunks
@@ -0,0 +1,40 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class HistCursor(NamedTuple):
+    """Position after the last returned plant history row.
+
+    Rows are ordered by (added_at, id) descending, remaining keeps how many rows
+    are left from the limit of the first request.
+    """
+
+    added_at: datetime
+    id: int
+    remaining: Optional[int] = None
+
+
+def encode_cursor(cursor: HistCursor) -> str:
+    payload = json.dumps([cursor.added_at.isoformat(), cursor.id, cursor.remaining])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> HistCursor:
+    try:
+        added_at, row_id, remaining = json.loads(base64.urlsafe_b64decode(cursor))
+        return HistCursor(
+            datetime.fromisoformat(added_at),
+            int(row_id),
+            None if remaining is None else int(remaining),
+        )
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
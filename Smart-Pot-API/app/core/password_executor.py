@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from ..core.settings import settings
+
+T = TypeVar("T")
+
+
+class PasswordExecutorBusy(Exception):
+    """All workers are busy and queue of waiting password operations is full"""
+
+
+class PasswordExecutor:
+    """Bounded executor for bcrypt hashing and verification.
+
+    bcrypt takes hundreds of milliseconds of CPU, so login storm run in shared
+    threadpool would hold every thread of it. Here at most max_workers hashes
+    run at once and at most max_queue wait for a worker, further operations are
+    rejected right away, so the rest of the threadpool stays free.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.completed = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password"
+                )
+            return self._executor
+
+    def _call(self, function: Callable[..., T], args: Tuple[Any, ...]) -> T:
+        try:
+            return function(*args)
+        finally:
+            # slot is free before caller gets the result
+            with self._lock:
+                self.completed += 1
+            self._slots.release()
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordExecutorBusy()
+        try:
+            future = self.executor.submit(self._call, function, args)
+        except BaseException:
+            self._slots.release()
+            raise
+        return future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+password_executor = PasswordExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
@@ -0,0 +1,13 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONUTCResponse(JSONResponse):
+    """JSON response serialized with orjson, naive datetimes are UTC like in db"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        )
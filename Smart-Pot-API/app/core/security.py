@@ -1,16 +1,21 @@
+import hashlib
 import secrets
 import string
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
 
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
+from ..core.cache import TTLCache
+from ..core.password_executor import PasswordExecutorBusy, password_executor
 from ..core.settings import settings
-from ..crud.crud_token import get_token_by_token
+from ..crud.crud_token import get_token_by_token, revoked_tokens, token_digest
 from ..models.blacklist_token import BlackListToken
 from ..models.user import User
 from ..schemas.message import Message
@@ -21,16 +26,54 @@ ACCESS_TOKEN_EXPIRE_MINUTES = (
     settings.ACCESS_TOKEN_EXPIRE_MINUTES
 )  # expire time for access token
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/token")
+# token digest -> claims of tokens, which signature was already verified
+access_token_cache = TTLCache(
+    maxsize=settings.ACCESS_TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_CACHE_TTL
+)
+
+
+@lru_cache()
+def get_password_context():
+    # passlib and bcrypt backend are loaded on first hash, not on app start
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+    )
+
+
+T = TypeVar("T")
+
+
+def run_password_operation(function: Callable[..., T], *args: Any) -> T:
+    try:
+        return password_executor.run(function, *args)
+    except PasswordExecutorBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations, try again later",
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)},
+        )
 
 
 def get_hashed_password(plain_password: str) -> str:
-    return password_context.hash(plain_password)
+    return run_password_operation(get_password_context().hash, plain_password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_context.verify(plain_password, hashed_password)
+    return run_password_operation(
+        get_password_context().verify, plain_password, hashed_password
+    )
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify password, new hash is returned when the old one has other cost"""
+    return run_password_operation(
+        get_password_context().verify_and_update, plain_password, hashed_password
+    )
 
 
 def verify_device_token(device_token_db: str, request_device_token: str) -> bool:
@@ -45,8 +88,22 @@ def verify_device_name_with_updated_name(device_in: str, device_updated) -> bool
     return False
 
 
+def token_claims(user: Optional[User] = None) -> Dict[str, Any]:
+    """Token id and, when user is known, user id and version of user's tokens.
+
+    Tokens are authenticated by primary key of the user and revoked all at once
+    by bumping user's token version.
+    """
+    claims: Dict[str, Any] = {"jti": uuid.uuid4().hex}
+    if user is not None:
+        claims.update(uid=user.id, ver=user.token_version)
+    return claims
+
+
 def create_access_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    user: Optional[User] = None,
 ) -> str:
     expires_delta_time: datetime
     if expires_delta is not None:
@@ -56,7 +113,11 @@ def create_access_token(
             minutes=ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
-    to_encode = {"exp": expires_delta_time, "subject": str(subject)}
+    to_encode = {
+        "exp": expires_delta_time,
+        "subject": str(subject),
+        **token_claims(user),
+    }
     if SECRET_KEY is not None:
         encoded_jwt = jwt.encode(claims=to_encode, key=SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
@@ -65,7 +126,9 @@ def create_access_token(
 
 
 def create_reset_password_token(
-    subject: Union[str, Any], expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    user: Optional[User] = None,
 ) -> str:
     expires_delta_time: datetime
     if expires_delta is not None:
@@ -74,7 +137,11 @@ def create_reset_password_token(
         expires_delta_time = datetime.utcnow() + timedelta(
             minutes=settings.RESET_PASSWORD_TOKEN_EXPIRE_TIME
         )
-    to_encode = {"exp": expires_delta_time, "subject": str(subject)}
+    to_encode = {
+        "exp": expires_delta_time,
+        "subject": str(subject),
+        **token_claims(user),
+    }
     if SECRET_KEY is not None:
         encoded_jwt = jwt.encode(claims=to_encode, key=SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
@@ -82,11 +149,11 @@ def create_reset_password_token(
         raise ValueError("SECRET_KEY must be set")
 
 
-def create_refresh_token(subject: Union[str, Any]) -> str:
+def create_refresh_token(subject: Union[str, Any], user: Optional[User] = None) -> str:
     expires_delta = datetime.utcnow() + timedelta(
         minutes=settings.REFRESH_TOKEN_EXPIRE_TIME
     )
-    to_encode = {"exp": expires_delta, "subject": str(subject)}
+    to_encode = {"exp": expires_delta, "subject": str(subject), **token_claims(user)}
     if SECRET_KEY is not None:
         encoded_jwt = jwt.encode(claims=to_encode, key=SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
@@ -95,18 +162,27 @@ def create_refresh_token(subject: Union[str, Any]) -> str:
 
 
 def destroy_access_token(db: Session, token: str, current_user: User) -> Message:
-    current_user_email = verify_access_token(token)
     try:
-        if current_user_email == current_user.email:
+        claims = decode_access_token(token)
+        if claims["subject"] == current_user.email:
             if get_token_by_token(db, token):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Token already in blacklist",
                 )
             invalidate_at = datetime.utcnow()
-            db_token = BlackListToken(token=token, invalidated_at=invalidate_at)
+            db_token = BlackListToken(
+                token=token,
+                token_digest=token_digest(token),
+                invalidated_at=invalidate_at,
+                expires_at=datetime.utcfromtimestamp(claims["exp"]),
+                jti=claims.get("jti"),
+            )
             db.add(db_token)
             db.commit()
+            if "jti" in claims:
+                revoked_tokens.add(claims["jti"])
+            access_token_cache.invalidate(access_token_digest(token))
             return Message(message="Token destroyed successfully")
         else:
             raise HTTPException(
@@ -125,11 +201,35 @@ def create_device_token(length_token: int) -> str:
     return "".join(secrets.choice(characters) for _ in range(length_token))
 
 
-def verify_access_token(token: str) -> Optional[str]:
+def access_token_digest(token: str) -> bytes:
+    # cache doesn't keep usable tokens in memory
+    return hashlib.sha256(token.encode()).digest()
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Claims of the token, decoding is skipped for recently verified tokens.
+
+    Cache only replaces signature and expiry checks, destroyed tokens are still
+    checked by callers, so token destroyed by other worker is rejected as well.
+    """
+    digest = access_token_digest(token)
+    cached_claims = access_token_cache.get(digest)
+    if cached_claims is not None:
+        if cached_claims["exp"] > time.time():
+            return cached_claims
+        access_token_cache.invalidate(digest)
     try:
         decoded_token = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
-        return decoded_token["subject"]
+        # entry must not outlive the token
+        access_token_cache.set(
+            digest, decoded_token, ttl=decoded_token["exp"] - time.time()
+        )
+        return decoded_token
     except jwt.ExpiredSignatureError:
         raise jwt.ExpiredSignatureError
     except jwt.JWTError:
         raise jwt.JWTError
+
+
+def verify_access_token(token: str) -> Optional[str]:
+    return decode_access_token(token)["subject"]
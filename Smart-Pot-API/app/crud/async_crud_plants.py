@@ -0,0 +1,87 @@
+"""Async versions of device ingest crud functions, used when DATABASE_ASYNC is on.
+
+Only device ingest, which exhausts the threadpool under burst load, has async
+versions. Other crud functions and user facing endpoints stay sync, they depend
+on the sync authentication chain.
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.settings import settings
+from ..crud.crud_devices import device_token_exists_statement
+from ..crud.crud_plant_hist import plant_hist_rollup_statements
+from ..crud.crud_plants import (
+    PLANT_UPDATE_OPTIONS,
+    check_plant_hist_buffer_capacity,
+    get_plant_update_data,
+    group_readings_by_token,
+    loaded_plant_objects,
+    plant_history_row,
+    plant_update_statement,
+    plant_update_with_history_statement,
+    plants_batch_message,
+    raise_plant_update_not_found,
+    replay_plants_batch,
+    select_batch_plants,
+    select_plant_to_update,
+)
+from ..db.plant_hist_buffer import plant_hist_buffer
+from ..models.plant import Plant as PlantDB
+from ..models.plant import Plant_Hist
+from ..schemas.plant import PlantBatchUpdate, PlantUpdate
+
+
+async def device_token_exists(db: AsyncSession, device_token: str) -> bool:
+    return await db.scalar(device_token_exists_statement(device_token)) is not None
+
+
+async def update_plant(db: AsyncSession, updated_plant: PlantUpdate) -> Any:
+    check_plant_hist_buffer_capacity(1)
+    plant_data = get_plant_update_data(updated_plant)
+    db_plant = await _update_plant_reading(db, plant_data, updated_plant.device_token)
+    if not db_plant:
+        raise_plant_update_not_found(
+            await device_token_exists(db, updated_plant.device_token)
+        )
+    for loaded_object in loaded_plant_objects(db_plant):
+        db.expunge(loaded_object)
+    await db.commit()
+    return db_plant
+
+
+async def _update_plant_reading(
+    db: AsyncSession, plant_data: Dict[str, Any], device_token: str
+) -> Optional[PlantDB]:
+    target_plant = select_plant_to_update(device_token)
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        previous_plant = (await db.execute(target_plant)).one_or_none()
+        if previous_plant is None:
+            return None
+        plant_hist_buffer.extend_after_commit(
+            db.sync_session, [plant_history_row(previous_plant)]
+        )
+        update_statement = plant_update_statement(plant_data).where(
+            PlantDB.id == previous_plant.id
+        )
+    else:
+        update_statement = plant_update_with_history_statement(plant_data, target_plant)
+    result = await db.scalars(update_statement, execution_options=PLANT_UPDATE_OPTIONS)
+    return result.one_or_none()
+
+
+async def update_plants_batch(db: AsyncSession, plants_batch: PlantBatchUpdate) -> Any:
+    readings_by_token = group_readings_by_token(plants_batch)
+    check_plant_hist_buffer_capacity(sum(map(len, readings_by_token.values())))
+    db_plants = (await db.execute(select_batch_plants(readings_by_token.keys()))).all()
+    history_rows, latest_rows = replay_plants_batch(readings_by_token, db_plants)
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        plant_hist_buffer.extend_after_commit(db.sync_session, history_rows)
+    else:
+        await db.execute(insert(Plant_Hist), history_rows)
+        for statement in plant_hist_rollup_statements(history_rows):
+            await db.execute(statement)
+    await db.execute(update(PlantDB), latest_rows)
+    await db.commit()
+    return plants_batch_message(history_rows, latest_rows)
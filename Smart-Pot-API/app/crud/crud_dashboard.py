@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from ..crud.crud_plant_hist import SENSORS, get_plant_hist_sparklines
+from ..models.plant import Plant as PlantDB
+from ..schemas.utils.sensors_type import SensorType
+
+SPARKLINE_PERIOD = timedelta(hours=24)
+
+
+def get_sensor_status(plant: PlantDB, sensor: str) -> Dict[str, Any]:
+    value = getattr(plant, sensor)
+    status = {"value": value}
+    for threshold in plant.sensor_threshold:
+        if SensorType(threshold.threshold_id).name != sensor:
+            continue
+        status.update(
+            min_value=threshold.min_value,
+            max_value=threshold.max_value,
+            in_range=value is not None
+            and threshold.min_value <= value <= threshold.max_value,
+        )
+    return status
+
+
+def get_user_dashboard(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    """Summary of all user's plants in three queries regardless of plant count"""
+    plants = db.scalars(
+        select(PlantDB)
+        .filter(PlantDB.user_id == user_id)
+        .options(selectinload(PlantDB.sensor_threshold))
+        .order_by(PlantDB.id)
+    ).all()
+    sparklines = get_plant_hist_sparklines(
+        db, [plant.id for plant in plants], datetime.utcnow() - SPARKLINE_PERIOD
+    )
+    return [
+        {
+            "id": plant.id,
+            "name": plant.name,
+            "imgsrc": plant.imgsrc,
+            "device_id": plant.device_id,
+            "last_updated": plant.last_updated,
+            **{sensor: get_sensor_status(plant, sensor) for sensor in SENSORS},
+            "sparkline": sparklines.get(plant.id, []),
+        }
+        for plant in plants
+    ]
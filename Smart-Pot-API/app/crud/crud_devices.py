@@ -1,17 +1,22 @@
 from typing import Annotated, List
 
-import shortuuid
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import String, cast
+from sqlalchemy import String, cast, select
 from sqlalchemy.orm import Session
 
-from ..crud.crud_users import get_current_active_user, get_user_by_email
+from ..core.dependencies import get_read_db
+from ..crud.crud_users import (
+    UserSnapshot,
+    get_current_active_user_snapshot,
+    get_user_by_email,
+)
 from ..models.device import Device
-from ..models.user import User
 from ..schemas.device import DeviceCreate
 
 
 def create_id_for_device(device_type: str):
+    import shortuuid
+
     device_uuid = shortuuid.uuid()
     return f"{device_type}-{device_uuid}"
 
@@ -22,20 +27,30 @@ def get_device_by_id(db: Session, device_id: str):
 
 
 def get_device_by_token(db: Session, device_token: str):
-    device_by_token = (
-        db.query(Device).filter(Device.device_token == device_token).first()
-    )
+    device_by_token = db.scalars(
+        select(Device).filter(Device.device_token == device_token).limit(1)
+    ).first()
     return device_by_token
 
 
+def device_token_exists_statement(device_token: str):
+    return select(Device.id).filter(Device.device_token == device_token).limit(1)
+
+
+def device_token_exists(db: Session, device_token: str) -> bool:
+    return db.scalar(device_token_exists_statement(device_token)) is not None
+
+
 def get_current_user_devices(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    db: Session = Depends(get_read_db),
 ) -> List[Device]:
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return current_user.devices
+    # queried on read session instead of lazy load on session of current user
+    return db.query(Device).filter(Device.user_id == current_user.id).all()
 
 
 def create_new_device(
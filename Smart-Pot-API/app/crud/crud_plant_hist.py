@@ -0,0 +1,499 @@
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Type,
+    Union,
+)
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    DateTime,
+    Float,
+    Integer,
+    column,
+    delete,
+    func,
+    literal_column,
+    select,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+from ..core.settings import settings
+from ..models.plant import (
+    Plant_Hist,
+    Plant_Hist_Daily,
+    Plant_Hist_Hourly,
+    PlantHistRollupMixin,
+)
+from ..schemas.utils.hist_resolution import HistResolution
+
+SENSORS = ("temperature", "lux", "humidity")
+PLANT_HIST_COLUMNS = ("id", *SENSORS, "added_at", "plant_id")
+ROLLUP_MODELS: Dict[HistResolution, Type[PlantHistRollupMixin]] = {
+    HistResolution.HOUR: Plant_Hist_Hourly,
+    HistResolution.DAY: Plant_Hist_Daily,
+}
+
+
+def plant_hist_rollup_statement(
+    rollup_model: Type[PlantHistRollupMixin],
+    resolution: HistResolution,
+    source: FromClause,
+):
+    """Build upsert, which adds history rows from source to rollup buckets.
+
+    Source needs plant_id, added_at, temperature, lux and humidity columns.
+    """
+    # literal keeps the same SQL in select and group by clauses
+    bucket = func.date_trunc(literal_column(f"'{resolution.value}'"), source.c.added_at)
+    aggregates = [func.count().label("count")]
+    for sensor in SENSORS:
+        aggregates.extend(
+            [
+                func.min(source.c[sensor]).label(f"{sensor}_min"),
+                func.max(source.c[sensor]).label(f"{sensor}_max"),
+                func.sum(source.c[sensor]).label(f"{sensor}_sum"),
+            ]
+        )
+    aggregated = select(
+        source.c.plant_id, bucket.label("bucket"), *aggregates
+    ).group_by(source.c.plant_id, bucket)
+    statement = insert(rollup_model).from_select(
+        ["plant_id", "bucket", *(aggregate.name for aggregate in aggregates)],
+        aggregated,
+    )
+    rollup = rollup_model.__table__.c
+    excluded = statement.excluded
+    updated_values = {"count": rollup.count + excluded.count}
+    for sensor in SENSORS:
+        updated_values.update(
+            {
+                f"{sensor}_min": func.least(
+                    rollup[f"{sensor}_min"], excluded[f"{sensor}_min"]
+                ),
+                f"{sensor}_max": func.greatest(
+                    rollup[f"{sensor}_max"], excluded[f"{sensor}_max"]
+                ),
+                f"{sensor}_sum": rollup[f"{sensor}_sum"] + excluded[f"{sensor}_sum"],
+            }
+        )
+    return statement.on_conflict_do_update(
+        index_elements=[rollup.plant_id, rollup.bucket], set_=updated_values
+    )
+
+
+def plant_hist_rollup_statements(history_rows: List[Dict[str, Any]]) -> List[Any]:
+    """Upserts adding history rows to hourly and daily rollups"""
+    if not history_rows:
+        return []
+    readings = values(
+        column("plant_id", Integer),
+        column("added_at", DateTime),
+        *(column(sensor, Float) for sensor in SENSORS),
+        name="readings",
+    ).data(
+        [
+            (
+                row["plant_id"],
+                row["added_at"],
+                *(row[sensor] for sensor in SENSORS),
+            )
+            for row in history_rows
+        ]
+    )
+    return [
+        plant_hist_rollup_statement(rollup_model, resolution, readings)
+        for resolution, rollup_model in ROLLUP_MODELS.items()
+    ]
+
+
+def update_plant_hist_rollups(
+    db: Union[Session, Connection], history_rows: List[Dict[str, Any]]
+) -> None:
+    """Add saved plant history rows to hourly and daily rollups"""
+    for statement in plant_hist_rollup_statements(history_rows):
+        db.execute(statement)
+
+
+def plant_hist_retention_start(retention_days: int) -> datetime:
+    """Start of the oldest month of history, which is not archived"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    return datetime(cutoff.year, cutoff.month, 1)
+
+
+def rebuild_plant_hist_rollups(
+    db: Session, plant_id: Optional[int] = None, since: Optional[datetime] = None
+) -> None:
+    """Recalculate hourly and daily rollups from raw plant history since the date.
+
+    Raw rows of archived months are deleted and their rollups are kept, so only
+    months within PLANT_HIST_RETENTION_DAYS can be rebuilt, by default all of them.
+    """
+    retention_start = plant_hist_retention_start(settings.PLANT_HIST_RETENTION_DAYS)
+    if since is None:
+        since = retention_start
+    elif since < retention_start:
+        raise ValueError(
+            f"Rollups before {retention_start:%Y-%m-%d} belong to archived history "
+            "and cannot be rebuilt"
+        )
+    # whole days, daily buckets are deleted and recalculated at once
+    since = datetime(since.year, since.month, since.day)
+    history = select(
+        Plant_Hist.plant_id,
+        Plant_Hist.added_at,
+        *(getattr(Plant_Hist, sensor) for sensor in SENSORS),
+    ).filter(Plant_Hist.plant_id.is_not(None), Plant_Hist.added_at >= since)
+    if plant_id is not None:
+        history = history.filter(Plant_Hist.plant_id == plant_id)
+    history = history.subquery("history")
+    for resolution, rollup_model in ROLLUP_MODELS.items():
+        delete_statement = delete(rollup_model).where(rollup_model.bucket >= since)
+        if plant_id is not None:
+            delete_statement = delete_statement.where(rollup_model.plant_id == plant_id)
+        db.execute(delete_statement)
+        db.execute(plant_hist_rollup_statement(rollup_model, resolution, history))
+    db.commit()
+
+
+def delete_plant_hist_rollups_by_plant_id(db: Session, plant_id: int) -> None:
+    for rollup_model in ROLLUP_MODELS.values():
+        db.execute(delete(rollup_model).where(rollup_model.plant_id == plant_id))
+
+
+def _select_plant_hist_rollups(rollup_model: Type[PlantHistRollupMixin], plant_id: int):
+    averages = [
+        (getattr(rollup_model, f"{sensor}_sum") / rollup_model.count).label(
+            f"{sensor}_avg"
+        )
+        for sensor in SENSORS
+    ]
+    return select(
+        rollup_model.plant_id,
+        rollup_model.bucket,
+        rollup_model.count,
+        *(
+            getattr(rollup_model, f"{sensor}_{aggregate}")
+            for sensor in SENSORS
+            for aggregate in ("min", "max")
+        ),
+        *averages,
+    ).filter(rollup_model.plant_id == plant_id)
+
+
+def get_plant_hist_rollups_limit(
+    db: Session, plant_id: int, resolution: HistResolution, limit: int
+):
+    rollup_model = ROLLUP_MODELS[resolution]
+    return db.execute(
+        _select_plant_hist_rollups(rollup_model, plant_id)
+        .order_by(rollup_model.bucket.desc())
+        .limit(limit)
+    ).all()
+
+
+def get_plant_hist_rollups_by_date(
+    db: Session,
+    plant_id: int,
+    resolution: HistResolution,
+    start_at: datetime,
+    end_at: datetime,
+):
+    rollup_model = ROLLUP_MODELS[resolution]
+    return db.execute(
+        _select_plant_hist_rollups(rollup_model, plant_id)
+        .filter(
+            rollup_model.bucket >= func.date_trunc(resolution.value, start_at),
+            rollup_model.bucket <= end_at,
+        )
+        .order_by(rollup_model.bucket.desc())
+    ).all()
+
+
+def get_plant_hist_sparklines(
+    db: Session, plant_ids: List[int], start_at: datetime
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Hourly averages of sensors for many plants in one query"""
+    if not plant_ids:
+        return {}
+    rows = db.execute(
+        select(
+            Plant_Hist_Hourly.plant_id,
+            Plant_Hist_Hourly.bucket,
+            *(
+                (
+                    getattr(Plant_Hist_Hourly, f"{sensor}_sum")
+                    / Plant_Hist_Hourly.count
+                ).label(sensor)
+                for sensor in SENSORS
+            ),
+        )
+        .filter(
+            Plant_Hist_Hourly.plant_id.in_(plant_ids),
+            Plant_Hist_Hourly.bucket >= func.date_trunc("hour", start_at),
+        )
+        .order_by(Plant_Hist_Hourly.plant_id, Plant_Hist_Hourly.bucket)
+    ).all()
+    sparklines: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        sparklines.setdefault(row.plant_id, []).append(
+            {
+                "bucket": row.bucket,
+                **{sensor: getattr(row, sensor) for sensor in SENSORS},
+            }
+        )
+    return sparklines
+
+
+def convert_local_datetime_to_utc(local_datetime: datetime, timezone: str) -> datetime:
+    """Convert naive datetime in user's timezone to naive UTC, like added_at"""
+    import pytz
+
+    localized = pytz.timezone(timezone).localize(local_datetime)
+    return localized.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def get_plant_hist_buckets(
+    db: Session,
+    plant_id: int,
+    start_at: datetime,
+    end_at: datetime,
+    bucket_minutes: int,
+    timezone: str,
+) -> List[Dict[str, Any]]:
+    """Aggregate plant history in buckets aligned to midnight in user's timezone.
+
+    start_at and end_at are naive UTC datetimes.
+    """
+    local_added_at = func.timezone(timezone, func.timezone("UTC", Plant_Hist.added_at))
+    local_bucket = func.date_bin(
+        func.make_interval(0, 0, 0, 0, 0, bucket_minutes),
+        local_added_at,
+        datetime(2000, 1, 1),
+    )
+    statistics = []
+    for sensor in SENSORS:
+        sensor_column = getattr(Plant_Hist, sensor)
+        statistics.extend(
+            [
+                func.min(sensor_column).label(f"{sensor}_min"),
+                func.max(sensor_column).label(f"{sensor}_max"),
+                func.avg(sensor_column).label(f"{sensor}_mean"),
+                func.percentile_cont(0.95)
+                .within_group(sensor_column)
+                .label(f"{sensor}_p95"),
+            ]
+        )
+    rows = db.execute(
+        select(
+            # bucket start as timestamp with time zone
+            func.timezone(timezone, local_bucket).label("bucket"),
+            func.count().label("count"),
+            *statistics,
+        )
+        .filter(
+            Plant_Hist.plant_id == plant_id,
+            Plant_Hist.added_at >= start_at,
+            Plant_Hist.added_at <= end_at,
+        )
+        .group_by(literal_column("bucket"))
+        .order_by(literal_column("bucket"))
+    ).all()
+    return [
+        {
+            "bucket": row.bucket,
+            "count": row.count,
+            **{
+                sensor: {
+                    statistic: getattr(row, f"{sensor}_{statistic}")
+                    for statistic in ("min", "max", "mean", "p95")
+                }
+                for sensor in SENSORS
+            },
+        }
+        for row in rows
+    ]
+
+
+def _select_plant_hist_columns(plant_id: int):
+    # plain rows instead of ORM objects, only arrays are built from them
+    return select(*(getattr(Plant_Hist, name) for name in PLANT_HIST_COLUMNS)).filter(
+        Plant_Hist.plant_id == plant_id
+    )
+
+
+class PlantHistRow(NamedTuple):
+    """Downsampled reading, fields in order of PLANT_HIST_COLUMNS"""
+
+    id: int
+    temperature: float
+    lux: float
+    humidity: float
+    added_at: datetime
+    plant_id: int
+
+
+def read_plant_hist_arrays(
+    batches: Iterable[List[Row]], max_rows: int
+) -> Dict[str, Any]:
+    """Copy batches of history rows to numpy array of every column but plant_id.
+
+    Only one batch of rows is held at once, arrays take about 40 bytes per
+    reading. Ranges with more than max_rows readings are refused with 400.
+    """
+    # numpy is imported on first downsampled request, not on app start
+    import numpy as np
+
+    dtypes = {
+        "id": np.int64,
+        **{sensor: np.float64 for sensor in SENSORS},
+        "added_at": "datetime64[us]",
+    }
+    chunks: Dict[str, List[Any]] = {name: [] for name in dtypes}
+    read = 0
+    for batch in batches:
+        read += len(batch)
+        if read > max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot downsample more than {max_rows} readings, "
+                "use shorter range or hour or day resolution",
+            )
+        for name, column_values in zip(PLANT_HIST_COLUMNS, zip(*batch)):
+            if name in dtypes:
+                chunks[name].append(np.array(column_values, dtype=dtypes[name]))
+    return {
+        name: np.concatenate(arrays) if arrays else np.array([], dtype=dtypes[name])
+        for name, arrays in chunks.items()
+    }
+
+
+def downsample_plant_hist(
+    columns: Dict[str, Any], plant_id: int, max_points: int
+) -> List[PlantHistRow]:
+    """Downsample history arrays ordered by added_at ascending with LTTB.
+
+    Every sensor is downsampled separately and union of kept rows is returned
+    in descending order, like other history queries, so one sensor peak is not
+    lost because of other sensors. Result has at most 3 * max_points rows.
+    """
+    import numpy as np
+
+    from ..core.downsampling import lttb_indices
+
+    count = len(columns["id"])
+    if count <= max_points:
+        kept = np.arange(count)
+    else:
+        added_at = columns["added_at"].astype(np.int64).astype(np.float64)
+        kept = np.unique(
+            np.concatenate(
+                [
+                    lttb_indices(added_at, columns[sensor], max_points)
+                    for sensor in SENSORS
+                ]
+            )
+        )
+    kept = kept[::-1]
+    return [
+        PlantHistRow(*row_values, plant_id)
+        for row_values in zip(
+            *(columns[name][kept].tolist() for name in PLANT_HIST_COLUMNS[:-1])
+        )
+    ]
+
+
+def _read_plant_hist_arrays_streamed(db: Session, statement) -> Dict[str, Any]:
+    result = db.execute(
+        statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    try:
+        return read_plant_hist_arrays(
+            result.partitions(), settings.HIST_DOWNSAMPLE_MAX_ROWS
+        )
+    finally:
+        result.close()
+
+
+def plant_hist_to_columns(rows: List[Row]) -> Dict[str, List[Any]]:
+    """Transpose history rows to lists of timestamps and sensor values"""
+    columns = dict(zip(PLANT_HIST_COLUMNS, zip(*rows)))
+    return {
+        "timestamps": list(columns.get("added_at", ())),
+        **{sensor: list(columns.get(sensor, ())) for sensor in SENSORS},
+    }
+
+
+def get_plant_hist_downsampled_limit(
+    db: Session, plant_id: int, limit: int, max_points: int
+) -> List[PlantHistRow]:
+    if limit > settings.HIST_DOWNSAMPLE_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot downsample more than "
+            f"{settings.HIST_DOWNSAMPLE_MAX_ROWS} readings, use smaller limit",
+        )
+    latest = (
+        _select_plant_hist_columns(plant_id)
+        .order_by(Plant_Hist.added_at.desc())
+        .limit(limit)
+    )
+    columns = _read_plant_hist_arrays_streamed(db, latest)
+    return downsample_plant_hist(
+        {name: array[::-1] for name, array in columns.items()}, plant_id, max_points
+    )
+
+
+def get_plant_hist_downsampled_by_date(
+    db: Session,
+    plant_id: int,
+    start_at: datetime,
+    end_at: datetime,
+    max_points: int,
+) -> List[PlantHistRow]:
+    columns = _read_plant_hist_arrays_streamed(
+        db,
+        _select_plant_hist_columns(plant_id)
+        .filter(Plant_Hist.added_at >= start_at, Plant_Hist.added_at <= end_at)
+        .order_by(Plant_Hist.added_at)
+        # one more row than allowed is enough to refuse the range
+        .limit(settings.HIST_DOWNSAMPLE_MAX_ROWS + 1),
+    )
+    return downsample_plant_hist(columns, plant_id, max_points)
+
+
+def stream_plant_hist_batches(
+    db: Session,
+    plant_ids: List[int],
+    batch_size: int,
+    start_at: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+) -> Iterator[List[Row]]:
+    """Read history of plants with server side cursor in batches of rows.
+
+    Without dates whole history is read, end_at is exclusive.
+    """
+    history = select(
+        *(getattr(Plant_Hist, name) for name in PLANT_HIST_COLUMNS)
+    ).filter(Plant_Hist.plant_id.in_(plant_ids))
+    if start_at is not None:
+        history = history.filter(Plant_Hist.added_at >= start_at)
+    if end_at is not None:
+        history = history.filter(Plant_Hist.added_at < end_at)
+    result = db.execute(
+        history.order_by(Plant_Hist.plant_id, Plant_Hist.added_at).execution_options(
+            yield_per=batch_size
+        )
+    )
+    for partition in result.partitions():
+        yield partition
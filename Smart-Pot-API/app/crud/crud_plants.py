@@ -1,17 +1,43 @@
+import math
+from collections import defaultdict
 from datetime import datetime, timezone
-from typing import Annotated, Any, List, Optional
+from typing import Annotated, Any, Dict, Iterable, List, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, selectinload
 
-from ..core.security import verify_device_token
-from ..crud.crud_devices import get_device_by_id, get_device_by_token
-from ..crud.crud_users import get_current_active_user, get_user_by_email
+from ..core.dependencies import get_read_db
+from ..core.pagination import HistCursor
+from ..core.settings import settings
+from ..crud.crud_devices import (
+    device_token_exists,
+    get_device_by_id,
+)
+from ..crud.crud_plant_hist import (
+    PLANT_HIST_COLUMNS,
+    ROLLUP_MODELS,
+    delete_plant_hist_rollups_by_plant_id,
+    plant_hist_rollup_statement,
+    update_plant_hist_rollups,
+)
+from ..crud.crud_users import (
+    UserSnapshot,
+    get_current_active_user_snapshot,
+    get_user_by_email,
+)
+from ..db.plant_hist_buffer import PlantHistBufferFull, plant_hist_buffer
 from ..models.device import Device
 from ..models.plant import Plant as PlantDB
 from ..models.plant import Plant_Hist
-from ..models.user import User
-from ..schemas.plant import ChangePlantName, Plant, PlantCreate, PlantUpdate
+from ..schemas.plant import (
+    ChangePlantName,
+    Plant,
+    PlantBatchUpdate,
+    PlantCreate,
+    PlantUpdate,
+)
 
 
 def convert_string_date_to_datetime(date: str, _format: str = "%Y-%m-%d") -> datetime:
@@ -25,53 +51,70 @@ def convert_string_date_to_datetime(date: str, _format: str = "%Y-%m-%d") -> dat
         )
 
 
-# TODO move sqlalchemy filter statement to 2.0 version
 def get_plant_by_id(db: Session, plant_id: int):
-    # plant_by_id = db.execute(select(PlantDB).filter_by(id=plant_id).limit(1)).first()
-    plant_by_id = db.query(PlantDB).filter(PlantDB.id == plant_id).first()
-    return plant_by_id
+    return db.scalars(select(PlantDB).filter(PlantDB.id == plant_id).limit(1)).first()
 
 
 def get_user_plant_by_id(db: Session, plant_id: int, user_id: int):
-    plant_by_id = (
-        db.query(PlantDB)
+    plant_by_id = db.scalars(
+        select(PlantDB)
         .filter(PlantDB.id == plant_id, PlantDB.user_id == user_id)
-        .first()
-    )
+        .limit(1)
+    ).first()
     return plant_by_id
 
 
+def get_user_plants(db: Session, user_id: int) -> List[PlantDB]:
+    """Load user's plants with devices and thresholds without loading the user"""
+    return list(
+        db.scalars(
+            select(PlantDB)
+            .filter(PlantDB.user_id == user_id)
+            .order_by(PlantDB.id)
+            .options(
+                selectinload(PlantDB.device), selectinload(PlantDB.sensor_threshold)
+            )
+        )
+    )
+
+
+def get_user_plant_ids(db: Session, user_id: int) -> List[int]:
+    return list(db.scalars(select(PlantDB.id).filter(PlantDB.user_id == user_id)))
+
+
 def delete_plant_hist_by_plant_id(db: Session, plant_id: int):
+    delete_plant_hist_rollups_by_plant_id(db, plant_id)
     plant_hist = db.query(Plant_Hist).filter(Plant_Hist.plant_id == plant_id).delete()
     db.commit()
     return plant_hist
 
 
 def get_plant_by_device_token(db: Session, device_token: str):
-    plant_by_device = (
-        db.query(PlantDB)
+    plant_by_device = db.scalars(
+        select(PlantDB)
         .join(Device, PlantDB.device_id == Device.id)
         .filter(Device.device_token == device_token)
-        .first()
-    )
+        .limit(1)
+    ).first()
     return plant_by_device
 
 
 def get_plant_by_device_id(db: Session, plant_device_id: str):
-    plant_by_device = (
-        db.query(PlantDB).filter(PlantDB.device_id == plant_device_id).first()
-    )
+    plant_by_device = db.scalars(
+        select(PlantDB).filter(PlantDB.device_id == plant_device_id).limit(1)
+    ).first()
     return plant_by_device
 
 
 def get_current_user_plants(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    current_user: Annotated[UserSnapshot, Depends(get_current_active_user_snapshot)],
+    db: Session = Depends(get_read_db),
 ) -> List[Plant]:
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    return current_user.plants
+    return get_user_plants(db, current_user.id)
 
 
 def create_new_plant(new_plant: PlantCreate, db: Session, user_id: int):
@@ -96,51 +139,266 @@ def create_new_plant(new_plant: PlantCreate, db: Session, user_id: int):
     return database_plant
 
 
+def plant_history_row(plant_db: Any) -> Dict[str, Any]:
+    """History row with the reading, which is currently saved in the plant"""
+    return {
+        "temperature": plant_db.temperature,
+        "lux": plant_db.lux,
+        "humidity": plant_db.humidity,
+        "added_at": plant_db.last_updated,
+        "plant_id": plant_db.id,
+    }
+
+
 def save_plant_history_data(db: Session, plant_db: PlantDB) -> Any:
-    plant_hist = Plant_Hist(
-        temperature=plant_db.temperature,
-        lux=plant_db.lux,
-        humidity=plant_db.humidity,
-        added_at=plant_db.last_updated,
-        plant_id=plant_db.id,
-    )
+    history_row = plant_history_row(plant_db)
+    plant_hist = Plant_Hist(**history_row)
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        plant_hist_buffer.extend_after_commit(db, [history_row])
+        return plant_hist
     db.add(plant_hist)
+    update_plant_hist_rollups(db, [history_row])
     db.commit()
     db.refresh(plant_hist)
     return plant_hist
 
 
+def check_plant_hist_buffer_capacity(row_count: int) -> None:
+    """Reject readings, which would be buffered, while the buffer is full"""
+    if not settings.PLANT_HIST_WRITE_BEHIND:
+        return
+    try:
+        plant_hist_buffer.check_capacity(row_count)
+    except PlantHistBufferFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many readings waiting to be saved, try again later",
+            headers={"Retry-After": str(math.ceil(settings.PLANT_HIST_FLUSH_INTERVAL))},
+        )
+
+
+def get_plant_update_data(updated_plant: PlantUpdate) -> Dict[str, Any]:
+    plant_data = updated_plant.dict(
+        exclude_unset=True, exclude={"device_token", "sensors"}
+    )
+    plant_data.update(updated_plant.sensors.dict())
+    return plant_data
+
+
+def loaded_plant_objects(db_plant: PlantDB) -> List[Any]:
+    # Loaded objects are detached before commit, so commit doesn't expire them
+    # and the response is serialized without loading the plant again
+    return [db_plant, db_plant.device, *db_plant.sensor_threshold]
+
+
 def update_plant(db: Session, updated_plant: PlantUpdate) -> Any:
-    db_device = get_device_by_token(db, updated_plant.device_token)
-    if not db_device:
+    # Device authentication, saving the previous reading to history and updating
+    # the plant are done by one statement in one transaction
+    check_plant_hist_buffer_capacity(1)
+    plant_data = get_plant_update_data(updated_plant)
+    db_plant = _update_plant_reading(db, plant_data, updated_plant.device_token)
+    if not db_plant:
+        raise_plant_update_not_found(
+            device_token_exists(db, updated_plant.device_token)
+        )
+    for loaded_object in loaded_plant_objects(db_plant):
+        db.expunge(loaded_object)
+    db.commit()
+    return db_plant
+
+
+def raise_plant_update_not_found(device_exists: bool) -> None:
+    if not device_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User cannot update plant with not exisiting device",
         )
-    db_plant = get_plant_by_device_token(db, device_token=updated_plant.device_token)
-    if not db_plant:
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Cannot find plant with that device",
+    )
+
+
+def select_plant_to_update(device_token: str):
+    """Select plant's current reading by device token"""
+    return (
+        select(
+            PlantDB.id,
+            PlantDB.temperature,
+            PlantDB.lux,
+            PlantDB.humidity,
+            PlantDB.last_updated,
+        )
+        .join(Device, PlantDB.device_id == Device.id)
+        .filter(Device.device_token == device_token)
+        .with_for_update(of=PlantDB)
+    )
+
+
+def plant_update_statement(plant_data: Dict[str, Any]):
+    return (
+        update(PlantDB)
+        .values(**plant_data)
+        .returning(PlantDB)
+        .options(selectinload(PlantDB.device), selectinload(PlantDB.sensor_threshold))
+    )
+
+
+def plant_update_with_history_statement(plant_data: Dict[str, Any], target_plant):
+    """Update, which also saves previous reading to history and rollups"""
+    target_plant = target_plant.cte("target_plant")
+    history = select(
+        target_plant.c.id.label("plant_id"),
+        target_plant.c.last_updated.label("added_at"),
+        target_plant.c.temperature,
+        target_plant.c.lux,
+        target_plant.c.humidity,
+    ).subquery("history")
+    plant_hist = (
+        insert(Plant_Hist)
+        .from_select(
+            ["temperature", "lux", "humidity", "added_at", "plant_id"],
+            select(
+                history.c.temperature,
+                history.c.lux,
+                history.c.humidity,
+                history.c.added_at,
+                history.c.plant_id,
+            ),
+        )
+        .cte("plant_hist")
+    )
+    update_statement = (
+        plant_update_statement(plant_data)
+        .add_cte(plant_hist)
+        .where(PlantDB.id == target_plant.c.id)
+    )
+    for resolution, rollup_model in ROLLUP_MODELS.items():
+        update_statement = update_statement.add_cte(
+            plant_hist_rollup_statement(rollup_model, resolution, history).cte(
+                rollup_model.__tablename__
+            )
+        )
+    return update_statement
+
+
+PLANT_UPDATE_OPTIONS = {"synchronize_session": False, "populate_existing": True}
+
+
+def _update_plant_reading(
+    db: Session, plant_data: Dict[str, Any], device_token: str
+) -> Optional[PlantDB]:
+    target_plant = select_plant_to_update(device_token)
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        # history goes to the write-behind buffer, so previous reading is read
+        # by separate statement
+        previous_plant = db.execute(target_plant).one_or_none()
+        if previous_plant is None:
+            return None
+        save_plant_history_data(db, previous_plant)
+        update_statement = plant_update_statement(plant_data).where(
+            PlantDB.id == previous_plant.id
+        )
+    else:
+        update_statement = plant_update_with_history_statement(plant_data, target_plant)
+    return db.scalars(
+        update_statement, execution_options=PLANT_UPDATE_OPTIONS
+    ).one_or_none()
+
+
+def group_readings_by_token(plants_batch: PlantBatchUpdate) -> Dict[str, List[Any]]:
+    readings_by_token = defaultdict(list)
+    for device_readings in plants_batch.devices:
+        readings_by_token[device_readings.device_token].extend(device_readings.readings)
+    return readings_by_token
+
+
+def select_batch_plants(device_tokens: Iterable[str]):
+    return (
+        select(
+            PlantDB.id,
+            PlantDB.temperature,
+            PlantDB.lux,
+            PlantDB.humidity,
+            PlantDB.last_updated,
+            PlantDB.device_id,
+            Device.device_token,
+        )
+        .join(Device, PlantDB.device_id == Device.id)
+        .filter(Device.device_token.in_(device_tokens))
+        # locked like single update, plants are locked in the same order by
+        # every batch, so concurrent batches don't deadlock
+        .order_by(PlantDB.id)
+        .with_for_update(of=PlantDB)
+    )
+
+
+def replay_plants_batch(
+    readings_by_token: Dict[str, List[Any]], db_plants: List[Any]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Split batch readings to history rows and the latest reading of every plant"""
+    plants_by_token = {db_plant.device_token: db_plant for db_plant in db_plants}
+    if len(plants_by_token) != len(readings_by_token):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cannot find plant with that device",
         )
-    if not verify_device_token(
-        db_plant.device.device_token, updated_plant.device_token
-    ):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Cannot verify device token",
+
+    history_rows = []
+    latest_rows = []
+    for device_token, readings in readings_by_token.items():
+        db_plant = plants_by_token[device_token]
+        # Replay readings in time order, so the result is the same as sending
+        # them one by one: every reading pushes the previous one into history
+        plant_states = [
+            {
+                "temperature": db_plant.temperature,
+                "lux": db_plant.lux,
+                "humidity": db_plant.humidity,
+                "last_updated": db_plant.last_updated,
+            }
+        ]
+        plant_states.extend(
+            {**reading.sensors.dict(), "last_updated": reading.last_updated}
+            for reading in readings
         )
-    save_plant_history_data(db, db_plant)
-    plant_data = updated_plant.dict(exclude_unset=True)
-    for key, value in plant_data.items():
-        if key == 'sensors':
-            for sensor_key, sensor_value in value.items():
-                setattr(db_plant, sensor_key, sensor_value)
-        setattr(db_plant, key, value)
-    db.add(db_plant)
+        plant_states.sort(key=lambda state: state["last_updated"])
+        for plant_state in plant_states[:-1]:
+            history_rows.append(
+                {
+                    "temperature": plant_state["temperature"],
+                    "lux": plant_state["lux"],
+                    "humidity": plant_state["humidity"],
+                    "added_at": plant_state["last_updated"],
+                    "plant_id": db_plant.id,
+                }
+            )
+        latest_rows.append({"id": db_plant.id, **plant_states[-1]})
+    return history_rows, latest_rows
+
+
+def plants_batch_message(
+    history_rows: List[Dict[str, Any]], latest_rows: List[Dict[str, Any]]
+) -> Dict[str, str]:
+    return {
+        "message": f"Saved {len(history_rows)} readings "
+        f"for {len(latest_rows)} devices"
+    }
+
+
+def update_plants_batch(db: Session, plants_batch: PlantBatchUpdate) -> Any:
+    readings_by_token = group_readings_by_token(plants_batch)
+    check_plant_hist_buffer_capacity(sum(map(len, readings_by_token.values())))
+    db_plants = db.execute(select_batch_plants(readings_by_token.keys())).all()
+    history_rows, latest_rows = replay_plants_batch(readings_by_token, db_plants)
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        plant_hist_buffer.extend_after_commit(db, history_rows)
+    else:
+        db.execute(insert(Plant_Hist), history_rows)
+        update_plant_hist_rollups(db, history_rows)
+    db.execute(update(PlantDB), latest_rows)
     db.commit()
-    db.refresh(db_plant)
-    return db_plant
+    return plants_batch_message(history_rows, latest_rows)
 
 
 def update_plant_name(
@@ -178,34 +436,58 @@ def delete_user_plant(plant_id: int, db: Session, user_email: str) -> Any:
     return {"message": "Plant deleted successfully"}
 
 
-def get_user_historical_plant_data_limit(db: Session, plant_id: int, limit: int):
-    plant_hist = (
-        db.query(Plant_Hist)
-        .filter(Plant_Hist.plant_id == plant_id)
-        .order_by(Plant_Hist.added_at.desc())
-        .limit(limit)
-        .all()
-    )
+def _filter_plant_hist_page(statement, cursor: Optional[HistCursor]):
+    """Order history newest first and skip rows up to the cursor with keyset"""
+    if cursor is not None:
+        statement = statement.filter(
+            tuple_(Plant_Hist.added_at, Plant_Hist.id)
+            < tuple_(cursor.added_at, cursor.id)
+        )
+    return statement.order_by(Plant_Hist.added_at.desc(), Plant_Hist.id.desc())
+
+
+def _select_plant_hist():
+    # Plain rows instead of ORM objects skip identity map and instrumentation,
+    # response models read the columns from rows like from attributes
+    return select(*(getattr(Plant_Hist, name) for name in PLANT_HIST_COLUMNS))
+
+
+def get_user_historical_plant_data_limit(
+    db: Session,
+    plant_id: int,
+    limit: int,
+    cursor: Optional[HistCursor] = None,
+) -> List[Row]:
+    plant_hist = db.execute(
+        _filter_plant_hist_page(
+            _select_plant_hist().filter(Plant_Hist.plant_id == plant_id), cursor
+        ).limit(limit)
+    ).all()
 
     return plant_hist
 
 
 def get_user_historical_plant_data_by_date(
-    db: Session, plant_id: int, start_at: str, end_at: Optional[str]
-):
+    db: Session,
+    plant_id: int,
+    start_at: str,
+    end_at: Optional[str],
+    cursor: Optional[HistCursor] = None,
+    page_size: int = settings.HIST_PAGE_SIZE,
+) -> List[Row]:
     if end_at is None:
         end_at_as_datetime = datetime.now(timezone.utc)
     else:
         end_at_as_datetime = convert_string_date_to_datetime(end_at)
     start_at_as_datetime = convert_string_date_to_datetime(start_at)
-    plant_hist = (
-        db.query(Plant_Hist)
-        .filter(
-            Plant_Hist.plant_id == plant_id,
-            Plant_Hist.added_at >= start_at_as_datetime,
-            Plant_Hist.added_at <= end_at_as_datetime,
-        )
-        .order_by(Plant_Hist.added_at.desc())
-        .all()
-    )
+    plant_hist = db.execute(
+        _filter_plant_hist_page(
+            _select_plant_hist().filter(
+                Plant_Hist.plant_id == plant_id,
+                Plant_Hist.added_at >= start_at_as_datetime,
+                Plant_Hist.added_at <= end_at_as_datetime,
+            ),
+            cursor,
+        ).limit(page_size)
+    ).all()
     return plant_hist
@@ -3,10 +3,10 @@ from typing import Annotated, Any
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from ..crud.crud_plants import get_user_plant_by_id
-from ..crud.crud_users import get_current_active_user
+from ..core.dependencies import get_read_db
+from ..crud.crud_plants import get_user_plant_by_id, get_user_plants
+from ..crud.crud_users import UserSnapshot, get_current_active_user_snapshot
 from ..models.sensor_threshold import SensorThreshold as SensorThresholdModel
-from ..models.user import User
 from ..schemas.sensor_threshold import SensorThresholdUpdate
 
 
@@ -25,7 +25,10 @@ def get_sensor_threshold_by_id(
 
 
 def get_current_user_sensor_thresholds(
-    current_active_user: Annotated[User, Depends(get_current_active_user)]
+    current_active_user: Annotated[
+        UserSnapshot, Depends(get_current_active_user_snapshot)
+    ],
+    db: Session = Depends(get_read_db),
 ):
     if not current_active_user:
         raise HTTPException(
@@ -33,7 +36,7 @@ def get_current_user_sensor_thresholds(
             detail="User not found or user is not active",
         )
     sensor_thresholds = []
-    for plant in current_active_user.plants:
+    for plant in get_user_plants(db, current_active_user.id):
         sensor_thresholds.append(plant.sensor_threshold)
 
     return sensor_thresholds
@@ -1,7 +1,118 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Set
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from ..core.settings import settings
 from ..models.blacklist_token import BlackListToken
 
 
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 def get_token_by_token(db: Session, token: str):
-    return db.query(BlackListToken).filter(BlackListToken.token == token).first()
+    return db.scalars(
+        select(BlackListToken)
+        .filter(BlackListToken.token_digest == token_digest(token))
+        .limit(1)
+    ).first()
+
+
+def prune_blacklist_tokens(db: Session, chunk_size: int) -> int:
+    """Delete expired tokens in short transactions of chunk_size rows.
+
+    Expired tokens are rejected by signature check, so they don't need to be
+    kept in blacklist.
+    """
+    deleted_rows = 0
+    while True:
+        chunk = (
+            select(BlackListToken.id)
+            .filter(BlackListToken.expires_at < datetime.utcnow())
+            .limit(chunk_size)
+        )
+        result = db.execute(
+            BlackListToken.__table__.delete().where(BlackListToken.id.in_(chunk))
+        )
+        db.commit()
+        deleted_rows += result.rowcount
+        if result.rowcount < chunk_size:
+            return deleted_rows
+
+
+class RevokedTokens:
+    """In-memory set of jti of destroyed tokens, which can be still unexpired.
+
+    The set is reloaded from blacklist at most once per refresh interval, so
+    token destroyed in other worker is rejected after the interval at latest.
+    Tokens destroyed in this worker are added immediately.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.refreshed_at = None
+        self._token_ids: Set[str] = set()
+        # ids added while the set is reloaded, so reload doesn't drop them
+        self._added_token_ids: Set[str] = set()
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session) -> Set[str]:
+        return set(
+            db.scalars(
+                select(BlackListToken.jti).filter(
+                    BlackListToken.jti.is_not(None),
+                    BlackListToken.expires_at > datetime.utcnow(),
+                )
+            )
+        )
+
+    def refresh(self, db: Session) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._added_token_ids = set()
+        try:
+            token_ids = self._load(db)
+            with self._lock:
+                self._token_ids = token_ids | self._added_token_ids
+                self.refreshed_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def is_revoked(self, db: Session, token_id: str) -> bool:
+        refreshed_at = self.refreshed_at
+        if (
+            refreshed_at is None
+            or time.monotonic() - refreshed_at >= self.refresh_interval
+        ):
+            self.refresh(db)
+        with self._lock:
+            return token_id in self._token_ids
+
+    def add(self, token_id: str) -> None:
+        with self._lock:
+            self._token_ids.add(token_id)
+            self._added_token_ids.add(token_id)
+
+    def __len__(self) -> int:
+        return len(self._token_ids)
+
+
+revoked_tokens = RevokedTokens(
+    refresh_interval=settings.REVOKED_TOKENS_REFRESH_INTERVAL
+)
+
+
+def is_token_destroyed(db: Session, token: str, claims: Dict[str, Any]) -> bool:
+    """Check destroyed tokens in memory, tokens without jti claim in blacklist"""
+    if "jti" in claims:
+        return revoked_tokens.is_revoked(db, claims["jti"])
+    return get_token_by_token(db, token) is not None
@@ -1,29 +1,50 @@
-from typing import Annotated, Any, Optional
+from typing import Annotated, Any, Dict, NamedTuple, Optional
 
-import pytz
 from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 
+from ..core.cache import TTLCache
 from ..core.dependencies import get_db
 from ..core.security import (
+    decode_access_token,
     get_hashed_password,
     oauth2_scheme,
-    verify_access_token,
-    verify_password,
+    verify_and_update_password,
 )
-from ..crud.crud_token import get_token_by_token
+from ..core.settings import settings
+from ..crud.crud_token import is_token_destroyed
+from ..models.plant import Plant
 from ..models.user import User
-from ..schemas.token import TokenPayload
 from ..schemas.user import UserCreate
 from ..schemas.utils.languages import Languages
 
 
+class UserSnapshot(NamedTuple):
+    """Columns of the user, which are enough to authorize read only requests"""
+
+    id: int
+    email: str
+    is_active: bool
+    language: Optional[str]
+    timezone: Optional[str]
+    token_version: int
+
+
+# user id -> UserSnapshot, invalidated by functions which change the user
+user_snapshot_cache = TTLCache(
+    maxsize=settings.USER_SNAPSHOT_CACHE_SIZE, ttl=settings.USER_SNAPSHOT_CACHE_TTL
+)
+
+
 def validate_user_timezone(timezone: str) -> bool:
     if isinstance(timezone, str):
         timezone = timezone.strip().replace(" ", "_")
     else:
         return False
+    import pytz
+
     try:
         pytz.timezone(timezone)
         return True
@@ -38,47 +59,147 @@ def get_user_by_email(db: Session, user_email: str):
     return None
 
 
+def get_user_with_plants(db: Session, user_id: int) -> Optional[User]:
+    """Load user with plants, their devices and thresholds in four queries.
+
+    User is usually already in the session after authentication, so
+    populate_existing is needed to apply loader options to it.
+    """
+    plants = selectinload(User.plants)
+    return db.scalars(
+        select(User)
+        .filter(User.id == user_id)
+        .options(
+            plants.selectinload(Plant.device),
+            plants.selectinload(Plant.sensor_threshold),
+        )
+        .execution_options(populate_existing=True)
+    ).first()
+
+
+def get_user_snapshot(db: Session, user_id: int) -> Optional[UserSnapshot]:
+    snapshot = user_snapshot_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+    user = db.execute(
+        select(*(getattr(User, field) for field in UserSnapshot._fields)).filter(
+            User.id == user_id
+        )
+    ).first()
+    if user is None:
+        return None
+    snapshot = UserSnapshot(*user)
+    user_snapshot_cache.set(user_id, snapshot)
+    return snapshot
+
+
+def invalidate_user_snapshot(user: User) -> None:
+    user_snapshot_cache.invalidate(user.id)
+
+
 def user_authentication(db: Session, user_email: str, password: str) -> Optional[User]:
     user = get_user_by_email(db=db, user_email=user_email)
     if not user:
         return None
-    if not verify_password(password, hashed_password=user.hashed_password):
+    verified, new_hashed_password = verify_and_update_password(
+        password, hashed_password=user.hashed_password
+    )
+    if not verified:
         return None
+    if new_hashed_password is not None:
+        user.hashed_password = new_hashed_password
+        db.commit()
     return user
 
 
-def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
+def get_token_user(db: Session, claims: Dict[str, Any]) -> Optional[User]:
+    """User of the token, None when user's tokens were revoked after it was issued.
+
+    User is loaded by primary key, tokens issued before uid claim was added are
+    looked up by email.
+    """
+    if "uid" not in claims:
+        return get_user_by_email(db=db, user_email=claims["subject"])
+    user = db.get(User, claims["uid"])
+    if (
+        user is None
+        or user.email != claims["subject"]
+        or user.token_version != claims["ver"]
+    ):
+        return None
+    return user
+
+
+def revoke_user_tokens(db: Session, user: User) -> None:
+    """Invalidate all tokens issued to the user so far"""
+    user.token_version = User.token_version + 1
+    db.commit()
+    invalidate_user_snapshot(user)
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def get_token_claims(token: str, db: Session) -> Dict[str, Any]:
+    """Claims of valid token, which was not destroyed"""
     token_expire_exception = HTTPException(
         status_code=401,
         detail="Token has expired",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        email = verify_access_token(token)
-        if get_token_by_token(db=db, token=token):
+        claims = decode_access_token(token)
+        if is_token_destroyed(db, token, claims):
             raise HTTPException(
                 status_code=401,
                 detail="Token is invalid or has been invalidated (logged out).",
             )
-        token_data = TokenPayload(email=email)
     except jwt.ExpiredSignatureError:
         raise token_expire_exception
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+    return claims
 
-    user = get_user_by_email(db=db, user_email=token_data.email)
+
+def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
+):
+    claims = get_token_claims(token, db)
+    user = get_token_user(db, claims)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 
+def get_current_user_snapshot(
+    token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)
+) -> UserSnapshot:
+    """Current user for read only endpoints, mostly without query of user table.
+
+    Snapshot can be stale by USER_SNAPSHOT_CACHE_TTL seconds for changes made
+    by other workers. Endpoints which change the user use get_current_user.
+    """
+    claims = get_token_claims(token, db)
+    if "uid" in claims:
+        snapshot = get_user_snapshot(db, claims["uid"])
+    else:
+        # tokens issued before uid claim was added
+        user = get_user_by_email(db=db, user_email=claims["subject"])
+        snapshot = None if user is None else get_user_snapshot(db, user.id)
+    if (
+        snapshot is None
+        or snapshot.email != claims["subject"]
+        or snapshot.token_version != claims.get("ver", snapshot.token_version)
+    ):
+        raise credentials_exception()
+    return snapshot
+
+
 def is_active(user: User) -> bool:
     if not user.is_active:
         return False
@@ -94,6 +215,7 @@ def update_user_timezone(db: Session, user: User, timezone: str) -> Any:
         )
     user.timezone = timezone
     db.commit()
+    invalidate_user_snapshot(user)
     db.refresh(user)
     return user
 
@@ -104,6 +226,7 @@ def update_user_language(db: Session, user: User, language: str) -> Any:
         raise ValueError(f"Language {language} is not supported")
     user.language = language
     db.commit()
+    invalidate_user_snapshot(user)
     db.refresh(user)
     return user
 
@@ -113,6 +236,7 @@ def control_user_activity(db: Session, user: User, state: bool) -> Any:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "User not correctly provided")
     user.is_active = state
     db.commit()
+    invalidate_user_snapshot(user)
     db.refresh(user)
     return user
 
@@ -123,6 +247,14 @@ def get_current_active_user(current_user: Annotated[User, Depends(get_current_us
     return current_user
 
 
+def get_current_active_user_snapshot(
+    current_user: Annotated[UserSnapshot, Depends(get_current_user_snapshot)]
+) -> UserSnapshot:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
 def create_new_user(db: Session, user: UserCreate):
     if not user:
         raise HTTPException(
@@ -144,6 +276,8 @@ def delete_user(db: Session, user: User) -> Any:
             status.HTTP_400_BAD_REQUEST,
             "Cannot delete user, which is not correctly provided",
         )
+    user_id = user.id
     db.delete(user)
     db.commit()
+    user_snapshot_cache.invalidate(user_id)
     return {"message": "User deleted successfully"}
@@ -1,6 +1,5 @@
 from pathlib import Path
 
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
 from starlette.responses import JSONResponse
 
 from ..core.settings import settings
@@ -8,12 +7,16 @@ from ..schemas.mail import Email
 
 
 class MailConnection:
+    """Sends emails with fastapi_mail, which is imported on first sent email"""
+
     def __init__(self, email: Email):
         self.config = self.create_connection_config
         self.email = email
 
     @property
     def create_connection_config(self):
+        from fastapi_mail import ConnectionConfig
+
         return ConnectionConfig(
             MAIL_USERNAME=settings.EMAIL_USERNAME,
             MAIL_PASSWORD=settings.EMAIL_PASSWORD,
@@ -30,6 +33,8 @@ class MailConnection:
     async def send_email_authentication_device_token(
         self, device_id: str
     ) -> JSONResponse:
+        from fastapi_mail import FastMail, MessageSchema, MessageType
+
         message = MessageSchema(
             subject=f"Authentication token for Device: {device_id}",
             recipients=[self.email.dict().get("email")],
@@ -45,6 +50,8 @@ class MailConnection:
         )
 
     async def send_email_resetting_password(self) -> JSONResponse:
+        from fastapi_mail import FastMail, MessageSchema, MessageType
+
         subject = f"Password recovery for user email: {self.email.dict().get('email')}"
         message = MessageSchema(
             subject=subject,
@@ -0,0 +1,210 @@
+"""Cold archive of raw plant history.
+
+Rows older than retention are compacted into one zstd compressed Parquet file per
+plant and month and deleted from plant_hist in chunks. Hourly and daily rollups
+are kept, so long range charts still work without raw rows. Rollups of archived
+months can't be rebuilt from raw rows anymore, so rebuild is limited to months
+within PLANT_HIST_RETENTION_DAYS and archive should use the same retention.
+"""
+import io
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from ..core.export import encode_parquet
+from ..core.settings import settings
+from ..crud.crud_plant_hist import (
+    PLANT_HIST_COLUMNS,
+    plant_hist_retention_start,
+    stream_plant_hist_batches,
+)
+from ..db.partitions import add_months
+from ..models.plant import Plant_Hist
+
+
+class LocalArchiveStorage:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.directory / key
+        if not path.exists():
+            return None
+        return path.read_bytes()
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self.directory / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_suffix(f"{path.suffix}.tmp")
+        temporary_path.write_bytes(data)
+        # replace is atomic, so half written archive is never visible
+        os.replace(temporary_path, path)
+
+
+class S3ArchiveStorage:
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None):
+        import boto3  # optional dependency, needed only for S3 archives
+
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def write(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+
+def get_archive_storage():
+    if settings.PLANT_HIST_ARCHIVE_S3_BUCKET:
+        return S3ArchiveStorage(
+            settings.PLANT_HIST_ARCHIVE_S3_BUCKET,
+            settings.PLANT_HIST_ARCHIVE_S3_ENDPOINT_URL,
+        )
+    return LocalArchiveStorage(settings.PLANT_HIST_ARCHIVE_DIR)
+
+
+def plant_hist_archive_key(plant_id: int, month: date) -> str:
+    return f"plant_{plant_id}/{month.year}-{month.month:02d}.parquet"
+
+
+def merge_plant_hist_archives(existing: bytes, new: bytes) -> bytes:
+    """Add rows from new archive, which are missing in existing one"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    existing_table = pq.read_table(io.BytesIO(existing))
+    new_table = pq.read_table(io.BytesIO(new))
+    missing_rows = new_table.filter(
+        pc.invert(pc.is_in(new_table["id"], value_set=existing_table["id"]))
+    )
+    merged = pa.concat_tables([existing_table, missing_rows]).sort_by("added_at")
+    output = io.BytesIO()
+    pq.write_table(merged, output, compression="zstd")
+    return output.getvalue()
+
+
+def get_expired_plant_hist_months(
+    db: Session, before_month: date
+) -> List[Tuple[int, date]]:
+    # literal keeps the same SQL in select and group by clauses
+    month = func.date_trunc(literal_column("'month'"), Plant_Hist.added_at)
+    rows = db.execute(
+        select(Plant_Hist.plant_id, month.label("month"))
+        .filter(
+            Plant_Hist.plant_id.is_not(None),
+            Plant_Hist.added_at < before_month,
+        )
+        .group_by(Plant_Hist.plant_id, month)
+        .order_by(Plant_Hist.plant_id, month)
+    ).all()
+    return [(row.plant_id, row.month.date()) for row in rows]
+
+
+def delete_plant_hist_chunked(
+    db: Session,
+    plant_id: int,
+    start_at: datetime,
+    end_at: datetime,
+    ids: List[int],
+    chunk_size: int,
+) -> int:
+    """Delete archived history rows by id in short transactions of chunk_size rows.
+
+    Rows which are not in the archive, e.g. committed after it was written, are
+    kept for the next run. Dates only let Postgres skip other partitions.
+    """
+    deleted_rows = 0
+    for chunk_start in range(0, len(ids), chunk_size):
+        result = db.execute(
+            Plant_Hist.__table__.delete().where(
+                Plant_Hist.plant_id == plant_id,
+                Plant_Hist.added_at >= start_at,
+                Plant_Hist.added_at < end_at,
+                Plant_Hist.id.in_(ids[chunk_start : chunk_start + chunk_size]),
+            )
+        )
+        db.commit()
+        deleted_rows += result.rowcount
+    return deleted_rows
+
+
+def archive_plant_hist_month(db: Session, storage, plant_id: int, month: date) -> int:
+    """Write history of the plant from one month to archive and delete it"""
+    start_at = datetime(month.year, month.month, 1)
+    end_at = datetime.combine(add_months(month, 1), datetime.min.time())
+    archived_ids: List[int] = []
+
+    def archived_batches():
+        for batch in stream_plant_hist_batches(
+            db,
+            [plant_id],
+            settings.EXPORT_BATCH_SIZE,
+            start_at=start_at,
+            end_at=end_at,
+        ):
+            archived_ids.extend(row.id for row in batch)
+            yield batch
+
+    archive = b"".join(encode_parquet(archived_batches(), PLANT_HIST_COLUMNS))
+    if not archived_ids:
+        return 0
+    key = plant_hist_archive_key(plant_id, month)
+    existing_archive = storage.read(key)
+    if existing_archive is not None:
+        archive = merge_plant_hist_archives(existing_archive, archive)
+    storage.write(key, archive)
+    return delete_plant_hist_chunked(
+        db,
+        plant_id,
+        start_at,
+        end_at,
+        archived_ids,
+        settings.PLANT_HIST_DELETE_CHUNK_SIZE,
+    )
+
+
+def archive_expired_plant_hist(
+    db: Session, storage, retention_days: int
+) -> List[Tuple[int, date, int]]:
+    """Archive whole months of history, which are older than retention_days"""
+    before_month = plant_hist_retention_start(retention_days).date()
+    archived = []
+    for plant_id, month in get_expired_plant_hist_months(db, before_month):
+        deleted_rows = archive_plant_hist_month(db, storage, plant_id, month)
+        archived.append((plant_id, month, deleted_rows))
+    return archived
+
+
+def restore_plant_hist_archive(
+    db: Session, storage, plant_id: int, month: date
+) -> Optional[int]:
+    """Insert rows from archive back to plant_hist, existing rows are skipped"""
+    import pyarrow.parquet as pq
+
+    archive = storage.read(plant_hist_archive_key(plant_id, month))
+    if archive is None:
+        return None
+    parquet_file = pq.ParquetFile(io.BytesIO(archive))
+    restored_rows = 0
+    for record_batch in parquet_file.iter_batches(
+        batch_size=settings.PLANT_HIST_DELETE_CHUNK_SIZE
+    ):
+        rows = record_batch.to_pylist()
+        for row in rows:
+            # archives keep UTC timestamps, added_at is naive UTC
+            row["added_at"] = row["added_at"].replace(tzinfo=None)
+        result = db.execute(insert(Plant_Hist).values(rows).on_conflict_do_nothing())
+        restored_rows += result.rowcount
+        db.commit()
+    return restored_rows
@@ -0,0 +1,27 @@
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from ..core.settings import settings
+from ..db.pool import PoolStats, configure_engine, engine_options
+
+async_pool_stats = PoolStats()
+
+
+# engines are created on first use, asyncpg is needed only in async mode
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    async_engine = create_async_engine(
+        settings.ASYNC_PRODUCTION_DATABASE_URL,
+        **engine_options(async_pool_stats, async_driver=True),
+    )
+    configure_engine(async_engine.sync_engine)
+    return async_engine
+
+
+@lru_cache()
+def get_async_sessionmaker() -> async_sessionmaker:
+    # objects can't be lazy loaded after commit in async session
+    return async_sessionmaker(
+        bind=get_async_engine(), autoflush=False, expire_on_commit=False
+    )
@@ -0,0 +1,164 @@
+"""Database maintenance commands, which should be run periodically e.g. by cron
+
+    python -m app.db.maintenance create-partitions --months-ahead 3
+    python -m app.db.maintenance detach-partitions --older-than-months 24 --drop
+    python -m app.db.maintenance rebuild-rollups --plant-id 1 --since 2023-05-01
+    python -m app.db.maintenance archive-plant-hist --retention-days 365
+    python -m app.db.maintenance restore-plant-hist --plant-id 1 --month 2023-05
+    python -m app.db.maintenance prune-token-blacklist
+"""
+import argparse
+from datetime import date, datetime
+
+from ..core.settings import settings
+from ..crud.crud_plant_hist import rebuild_plant_hist_rollups
+from ..crud.crud_token import prune_blacklist_tokens
+from ..db.archive import (
+    archive_expired_plant_hist,
+    get_archive_storage,
+    restore_plant_hist_archive,
+)
+from ..db.partitions import (
+    add_months,
+    create_plant_hist_partitions,
+    detach_plant_hist_partitions,
+)
+from ..db.session import SessionLocal, engine
+
+
+def create_partitions(args: argparse.Namespace) -> None:
+    current_month = date.today().replace(day=1)
+    with engine.begin() as connection:
+        partitions = create_plant_hist_partitions(
+            connection, current_month, args.months_ahead + 1
+        )
+    print(f"Created partitions: {', '.join(partitions) or 'none'}")
+
+
+def detach_partitions(args: argparse.Namespace) -> None:
+    before_month = add_months(date.today().replace(day=1), -args.older_than_months)
+    with engine.begin() as connection:
+        partitions = detach_plant_hist_partitions(
+            connection, before_month, drop=args.drop
+        )
+    action = "Dropped" if args.drop else "Detached"
+    print(f"{action} partitions: {', '.join(partitions) or 'none'}")
+
+
+def rebuild_rollups(args: argparse.Namespace) -> None:
+    since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+    db = SessionLocal()
+    try:
+        rebuild_plant_hist_rollups(db, plant_id=args.plant_id, since=since)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    finally:
+        db.close()
+    print("Rollups rebuilt")
+
+
+def archive_plant_hist(args: argparse.Namespace) -> None:
+    if args.retention_days < settings.PLANT_HIST_RETENTION_DAYS:
+        # rebuild of rollups would recalculate archived months from no rows
+        raise SystemExit(
+            "Retention cannot be shorter than PLANT_HIST_RETENTION_DAYS "
+            f"({settings.PLANT_HIST_RETENTION_DAYS} days)"
+        )
+    db = SessionLocal()
+    try:
+        archived = archive_expired_plant_hist(
+            db, get_archive_storage(), args.retention_days
+        )
+    finally:
+        db.close()
+    for plant_id, month, deleted_rows in archived:
+        print(f"Archived {deleted_rows} rows of plant {plant_id} from {month:%Y-%m}")
+    print(f"Archived months: {len(archived)}")
+
+
+def restore_plant_hist(args: argparse.Namespace) -> None:
+    month = datetime.strptime(args.month, "%Y-%m").date()
+    db = SessionLocal()
+    try:
+        restored_rows = restore_plant_hist_archive(
+            db, get_archive_storage(), args.plant_id, month
+        )
+    finally:
+        db.close()
+    if restored_rows is None:
+        print(f"Archive of plant {args.plant_id} from {args.month} does not exist")
+    else:
+        print(f"Restored {restored_rows} rows")
+
+
+def prune_token_blacklist(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        deleted_rows = prune_blacklist_tokens(db, args.chunk_size)
+    finally:
+        db.close()
+    print(f"Deleted expired tokens: {deleted_rows}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Smart Pot database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = commands.add_parser(
+        "create-partitions", help="Create monthly plant_hist partitions ahead of time"
+    )
+    create_parser.add_argument("--months-ahead", type=int, default=3)
+    create_parser.set_defaults(handler=create_partitions)
+
+    detach_parser = commands.add_parser(
+        "detach-partitions", help="Detach plant_hist partitions of old months"
+    )
+    detach_parser.add_argument("--older-than-months", type=int, required=True)
+    detach_parser.add_argument(
+        "--drop", action="store_true", help="Drop detached partitions"
+    )
+    detach_parser.set_defaults(handler=detach_partitions)
+
+    rollups_parser = commands.add_parser(
+        "rebuild-rollups", help="Recalculate hourly and daily rollups from history"
+    )
+    rollups_parser.add_argument(
+        "--plant-id", type=int, default=None, help="Rebuild only one plant"
+    )
+    rollups_parser.add_argument(
+        "--since",
+        default=None,
+        help="Date as YYYY-MM-DD, by default start of not archived history",
+    )
+    rollups_parser.set_defaults(handler=rebuild_rollups)
+
+    archive_parser = commands.add_parser(
+        "archive-plant-hist",
+        help="Move plant history older than retention to monthly archives",
+    )
+    archive_parser.add_argument(
+        "--retention-days", type=int, default=settings.PLANT_HIST_RETENTION_DAYS
+    )
+    archive_parser.set_defaults(handler=archive_plant_hist)
+
+    restore_parser = commands.add_parser(
+        "restore-plant-hist", help="Insert archived plant history back to database"
+    )
+    restore_parser.add_argument("--plant-id", type=int, required=True)
+    restore_parser.add_argument("--month", required=True, help="Month as YYYY-MM")
+    restore_parser.set_defaults(handler=restore_plant_hist)
+
+    prune_parser = commands.add_parser(
+        "prune-token-blacklist", help="Delete expired tokens from blacklist"
+    )
+    prune_parser.add_argument(
+        "--chunk-size", type=int, default=settings.BLACKLIST_PRUNE_CHUNK_SIZE
+    )
+    prune_parser.set_defaults(handler=prune_token_blacklist)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PLANT_HIST_TABLE = "plant_hist"
+PLANT_HIST_DEFAULT_PARTITION = f"{PLANT_HIST_TABLE}_default"
+PLANT_HIST_PARTITION_COLUMNS = "id, temperature, lux, humidity, added_at, plant_id"
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def plant_hist_partition_name(month: date) -> str:
+    return f"{PLANT_HIST_TABLE}_y{month.year}m{month.month:02d}"
+
+
+def relation_exists(connection: Connection, name: str) -> bool:
+    return (
+        connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        is not None
+    )
+
+
+def default_partition_has_rows(
+    connection: Connection, month_start: date, month_end: date
+) -> bool:
+    if not relation_exists(connection, PLANT_HIST_DEFAULT_PARTITION):
+        return False
+    return connection.execute(
+        text(
+            f"SELECT EXISTS (SELECT 1 FROM {PLANT_HIST_DEFAULT_PARTITION} "
+            "WHERE added_at >= :month_start AND added_at < :month_end)"
+        ),
+        {"month_start": month_start, "month_end": month_end},
+    ).scalar()
+
+
+def create_plant_hist_partition(
+    connection: Connection, partition_name: str, month: date
+) -> None:
+    """Create partition of the month, its rows are moved from default partition.
+
+    Postgres refuses to create partition for rows, which are in default partition
+    already, so default partition is detached while they are moved. Detach locks
+    plant_hist, so ingest waits until the rows are moved.
+    """
+    month_end = add_months(month, 1)
+    create_partition = text(
+        f"CREATE TABLE {partition_name} PARTITION OF {PLANT_HIST_TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{month_end.isoformat()}')"
+    )
+    if not default_partition_has_rows(connection, month, month_end):
+        connection.execute(create_partition)
+        return
+    month_rows = {"month_start": month, "month_end": month_end}
+    connection.execute(
+        text(
+            f"ALTER TABLE {PLANT_HIST_TABLE} "
+            f"DETACH PARTITION {PLANT_HIST_DEFAULT_PARTITION}"
+        )
+    )
+    connection.execute(create_partition)
+    connection.execute(
+        text(
+            f"INSERT INTO {partition_name} ({PLANT_HIST_PARTITION_COLUMNS}) "
+            f"SELECT {PLANT_HIST_PARTITION_COLUMNS} "
+            f"FROM {PLANT_HIST_DEFAULT_PARTITION} "
+            "WHERE added_at >= :month_start AND added_at < :month_end"
+        ),
+        month_rows,
+    )
+    connection.execute(
+        text(
+            f"DELETE FROM {PLANT_HIST_DEFAULT_PARTITION} "
+            "WHERE added_at >= :month_start AND added_at < :month_end"
+        ),
+        month_rows,
+    )
+    connection.execute(
+        text(
+            f"ALTER TABLE {PLANT_HIST_TABLE} "
+            f"ATTACH PARTITION {PLANT_HIST_DEFAULT_PARTITION} DEFAULT"
+        )
+    )
+
+
+def create_plant_hist_partitions(
+    connection: Connection, start_month: date, months: int
+) -> List[str]:
+    """Create monthly partitions of plant_hist, which don't exist yet"""
+    created_partitions = []
+    month = start_month.replace(day=1)
+    for _ in range(months):
+        partition_name = plant_hist_partition_name(month)
+        if not relation_exists(connection, partition_name):
+            create_plant_hist_partition(connection, partition_name, month)
+            created_partitions.append(partition_name)
+        month = add_months(month, 1)
+    return created_partitions
+
+
+def get_plant_hist_partitions(connection: Connection) -> List[str]:
+    return list(
+        connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+                "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+                "WHERE parent.relname = :table_name ORDER BY child.relname"
+            ),
+            {"table_name": PLANT_HIST_TABLE},
+        ).scalars()
+    )
+
+
+def detach_plant_hist_partitions(
+    connection: Connection, before_month: date, drop: bool = False
+) -> List[str]:
+    """Detach monthly partitions of plant_hist, which end before given month"""
+    detached_partitions = []
+    for partition_name in get_plant_hist_partitions(connection):
+        if not partition_name.startswith(f"{PLANT_HIST_TABLE}_y"):
+            # default partition
+            continue
+        if partition_name >= plant_hist_partition_name(before_month.replace(day=1)):
+            continue
+        connection.execute(
+            text(f"ALTER TABLE {PLANT_HIST_TABLE} DETACH PARTITION {partition_name}")
+        )
+        if drop:
+            connection.execute(text(f"DROP TABLE {partition_name}"))
+        detached_partitions.append(partition_name)
+    return detached_partitions
@@ -0,0 +1,240 @@
+import asyncio
+import csv
+import io
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from psycopg2 import DataError, IntegrityError
+from sqlalchemy import event, exc, select
+from sqlalchemy.orm import Session, SessionTransaction
+
+from ..core.settings import settings
+from ..crud.crud_plant_hist import update_plant_hist_rollups
+from ..db.session import engine
+from ..models.plant import Plant
+
+logger = logging.getLogger(__name__)
+
+PLANT_HIST_COLUMNS = ("temperature", "lux", "humidity", "added_at", "plant_id")
+# rows waiting in session.info until the session's transaction commits
+PENDING_ROWS_KEY = "pending_plant_hist_rows"
+
+
+class PlantHistBufferFull(Exception):
+    """Buffer reached its maximum size, new readings are rejected"""
+
+
+def is_refused_rows_error(error: Exception) -> bool:
+    """Error caused by the rows, which fails again on retry.
+
+    Other errors, e.g. lost connection, mean database is not available and rows
+    are kept for next flush. COPY runs on DBAPI cursor, so its errors are not
+    wrapped by SQLAlchemy.
+    """
+    if isinstance(error, exc.DBAPIError):
+        error = error.orig
+    return isinstance(error, (IntegrityError, DataError))
+
+
+class PlantHistBuffer:
+    """Write-behind queue for plant history rows.
+
+    Rows are kept in memory and written to plant_hist with COPY by the asyncio
+    flusher, when queue reaches flush_size or every flush_interval seconds.
+    Hourly and daily rollups are updated in the same transaction.
+    Rows which are not flushed yet are lost when the process is killed.
+
+    Rows are queued only after the ingest transaction commits. When the queue
+    holds max_size rows, ingest is rejected until the flusher catches up.
+    Rows of deleted plants and batches which the database refuses are dropped,
+    so one bad row doesn't block the buffer.
+    """
+
+    def __init__(self, flush_size: int, flush_interval: float, max_size: int):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._rows: Deque[Tuple[Any, ...]] = deque()
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._rows)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "flushed_rows": self.flushed_rows,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped_rows": self.dropped_rows,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
+
+    def check_capacity(self, row_count: int) -> None:
+        if len(self._rows) + row_count > self.max_size:
+            raise PlantHistBufferFull()
+
+    def append(self, row: Dict[str, Any]) -> None:
+        self._rows.append(tuple(row[column] for column in PLANT_HIST_COLUMNS))
+        self._wake_up_flusher()
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self._rows.extend(
+            tuple(row[column] for column in PLANT_HIST_COLUMNS) for row in rows
+        )
+        self._wake_up_flusher()
+
+    def extend_after_commit(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Queue rows when db commits, rows are discarded when it rolls back"""
+        db.info.setdefault(PENDING_ROWS_KEY, []).extend(rows)
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        data = io.StringIO()
+        csv.writer(data).writerows(rows)
+        data.seek(0)
+        with engine.begin() as connection:
+            with connection.connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY plant_hist ({', '.join(PLANT_HIST_COLUMNS)}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    data,
+                )
+            update_plant_hist_rollups(
+                connection,
+                [dict(zip(PLANT_HIST_COLUMNS, row)) for row in rows],
+            )
+
+    def _existing_plant_ids(self, plant_ids: Set[int]) -> Set[int]:
+        with engine.connect() as connection:
+            return set(
+                connection.scalars(select(Plant.id).filter(Plant.id.in_(plant_ids)))
+            )
+
+    def _drop(self, rows: List[Tuple[Any, ...]], reason: str) -> None:
+        self.dropped_rows += len(rows)
+        logger.error("Dropped %d plant history rows: %s", len(rows), reason)
+
+    def _write_or_drop(self, rows: List[Tuple[Any, ...]]) -> int:
+        """Write rows, when database refuses them, retry without rows of deleted
+        plants and drop the batch if it is still refused"""
+        try:
+            self._write(rows)
+            return len(rows)
+        except Exception as error:
+            if not is_refused_rows_error(error):
+                raise
+        plant_id_index = PLANT_HIST_COLUMNS.index("plant_id")
+        existing_plant_ids = self._existing_plant_ids(
+            {row[plant_id_index] for row in rows}
+        )
+        kept_rows = [row for row in rows if row[plant_id_index] in existing_plant_ids]
+        if len(kept_rows) < len(rows):
+            self._drop(
+                [row for row in rows if row[plant_id_index] not in existing_plant_ids],
+                "plants were deleted",
+            )
+        if not kept_rows:
+            return 0
+        try:
+            self._write(kept_rows)
+        except Exception as error:
+            if not is_refused_rows_error(error):
+                raise
+            self._drop(kept_rows, str(error))
+            return 0
+        return len(kept_rows)
+
+    def flush(self) -> int:
+        """Write all queued rows with one COPY, returns number of written rows"""
+        with self._flush_lock:
+            rows = []
+            while self._rows:
+                rows.append(self._rows.popleft())
+            if not rows:
+                return 0
+            start = time.perf_counter()
+            try:
+                written_rows = self._write_or_drop(rows)
+            except Exception:
+                self.failed_flushes += 1
+                # put rows back in their order, so they are written by next flush
+                self._rows.extendleft(reversed(rows))
+                raise
+            self.last_flush_seconds = time.perf_counter() - start
+            self.max_flush_seconds = max(
+                self.max_flush_seconds, self.last_flush_seconds
+            )
+            self.flushes += 1
+            self.flushed_rows += written_rows
+            return written_rows
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._rows:
+            await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception:
+                logger.exception("Cannot flush plant history buffer")
+
+    def _wake_up_flusher(self) -> None:
+        if self._loop is not None and len(self._rows) >= self.flush_size:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+
+plant_hist_buffer = PlantHistBuffer(
+    flush_size=settings.PLANT_HIST_FLUSH_SIZE,
+    flush_interval=settings.PLANT_HIST_FLUSH_INTERVAL,
+    max_size=settings.PLANT_HIST_BUFFER_MAX_SIZE,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def queue_committed_plant_hist_rows(session: Session) -> None:
+    rows = session.info.pop(PENDING_ROWS_KEY, None)
+    if rows:
+        plant_hist_buffer.extend(rows)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_rolled_back_plant_hist_rows(
+    session: Session, transaction: SessionTransaction
+) -> None:
+    # after_commit already took rows of committed transaction
+    if transaction.parent is None:
+        session.info.pop(PENDING_ROWS_KEY, None)
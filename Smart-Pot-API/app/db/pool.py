@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from ..core.settings import settings
+
+
+class PoolStats:
+    """Counters of connection checkouts and time spent waiting for the pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_seconds": self.wait_seconds / waits if waits else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+            }
+
+
+class InstrumentedPoolMixin:
+    stats: PoolStats
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - started_at, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started_at)
+        return connection
+
+
+def instrumented_pool_class(pool_class: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    # stats live on the class, because engine.dispose() creates new pool instance
+    return type(
+        f"Instrumented{pool_class.__name__}",
+        (InstrumentedPoolMixin, pool_class),
+        {"stats": stats},
+    )
+
+
+def engine_options(stats: PoolStats, async_driver: bool = False) -> Dict[str, Any]:
+    """Keyword arguments of create_engine built from pool settings.
+
+    In PgBouncer transaction mode every transaction can get different server
+    connection, so pooling is left to PgBouncer, prepared statements are not
+    used and statement timeout is set per transaction.
+    """
+    connect_args: Dict[str, Any] = {}
+    if settings.DATABASE_PGBOUNCER:
+        if async_driver:
+            connect_args.update(statement_cache_size=0, prepared_statement_cache_size=0)
+        return {"poolclass": NullPool, "connect_args": connect_args}
+    statement_timeout = settings.DATABASE_STATEMENT_TIMEOUT
+    if statement_timeout and async_driver:
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout)}
+    elif statement_timeout:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    pool_class = AsyncAdaptedQueuePool if async_driver else QueuePool
+    return {
+        "poolclass": instrumented_pool_class(pool_class, stats),
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def configure_engine(engine: Engine) -> None:
+    """Set statement timeout per transaction, when PgBouncer mode is on"""
+    if not (settings.DATABASE_PGBOUNCER and settings.DATABASE_STATEMENT_TIMEOUT):
+        return
+
+    @event.listens_for(engine, "begin")
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(settings.DATABASE_STATEMENT_TIMEOUT)}"
+        )
+
+
+def pool_status(engine: Engine, stats: PoolStats) -> Dict[str, Any]:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__, **stats.stats}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    return status
@@ -0,0 +1,120 @@
+"""Routing of read only requests to streaming replica.
+
+Replica is used only while its replay lag is below REPLICA_MAX_LAG, otherwise
+reads fall back to primary. Writes made by request are visible on replica after
+the lag, so endpoints which read own writes must keep using primary session.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..core.settings import settings
+from ..db.pool import PoolStats, configure_engine, engine_options
+from ..db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# replica which replayed all received WAL is up to date, even if primary was
+# idle and last replayed transaction is old
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class ReplicaLagMonitor:
+    """Cached check of replica lag, so it's not queried on every request.
+
+    Lag is queried by one request at a time outside of the lock, other requests
+    use the last known lag meanwhile, so slow replica doesn't block them.
+    """
+
+    def __init__(self, engine: Engine, max_lag: float, check_interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.fallbacks = 0
+        self._checking = False
+        self._lock = threading.Lock()
+
+    def fetch_lag(self) -> Optional[float]:
+        with self.engine.connect() as connection:
+            lag = connection.execute(REPLICA_LAG_QUERY).scalar()
+        return None if lag is None else float(lag)
+
+    def _start_check(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._checking or (
+                self.checked_at is not None
+                and now - self.checked_at < self.check_interval
+            ):
+                return False
+            self._checking = True
+            self.checked_at = now
+            return True
+
+    def _check(self) -> None:
+        try:
+            lag = self.fetch_lag()
+        except Exception:
+            # unreachable replica is treated like too stale one
+            logger.exception("Replica lag check failed")
+            lag = None
+        with self._lock:
+            self.lag = lag
+            self._checking = False
+
+    def is_fresh(self) -> bool:
+        if self._start_check():
+            self._check()
+        with self._lock:
+            fresh = self.lag is not None and self.lag <= self.max_lag
+            if not fresh:
+                self.fallbacks += 1
+            return fresh
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lag_seconds": self.lag,
+                "max_lag_seconds": self.max_lag,
+                "fallbacks": self.fallbacks,
+            }
+
+
+replica_pool_stats = PoolStats()
+replica_engine: Optional[Engine] = None
+ReplicaSessionLocal: Optional[sessionmaker] = None
+replica_lag_monitor: Optional[ReplicaLagMonitor] = None
+
+if settings.REPLICA_DATABASE_URL:
+    replica_engine_options = engine_options(replica_pool_stats)
+    # unreachable replica fails fast instead of waiting for TCP timeout
+    connect_args = replica_engine_options["connect_args"]
+    connect_args["connect_timeout"] = settings.REPLICA_CONNECT_TIMEOUT
+    replica_engine = create_engine(
+        settings.REPLICA_DATABASE_URL, **replica_engine_options
+    )
+    configure_engine(replica_engine)
+    ReplicaSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, bind=replica_engine
+    )
+    replica_lag_monitor = ReplicaLagMonitor(
+        replica_engine, settings.REPLICA_MAX_LAG, settings.REPLICA_LAG_CHECK_INTERVAL
+    )
+
+
+def get_read_session() -> Session:
+    if ReplicaSessionLocal is not None and replica_lag_monitor.is_fresh():
+        return ReplicaSessionLocal()
+    return SessionLocal()
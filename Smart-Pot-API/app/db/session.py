@@ -2,7 +2,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from ..core.settings import settings
+from ..db.pool import PoolStats, configure_engine, engine_options
 
 PRODUCTION_DATABASE_URL = settings.PRODUCTION_DATABASE_URL
-engine = create_engine(PRODUCTION_DATABASE_URL)
+pool_stats = PoolStats()
+engine = create_engine(PRODUCTION_DATABASE_URL, **engine_options(pool_stats))
+configure_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
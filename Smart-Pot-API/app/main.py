@@ -3,19 +3,50 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from mangum import Mangum
 
+from .api.endpoints.dashboard import router as dashboard_router
 from .api.endpoints.devices import router as devices_router
+from .api.endpoints.diagnostics import router as diagnostics_router
 from .api.endpoints.login import router as login_router
 from .api.endpoints.plants import router as plants_router
 from .api.endpoints.plants import router_historical as plants_router_historical
+from .api.endpoints.plants import router_ingest as plants_router_ingest
 from .api.endpoints.sensor_threshold import router as sensor_threshold_router
 from .api.endpoints.tags import Tag
 from .api.endpoints.users import router as users_router
+from .core.pagination import NEXT_CURSOR_HEADER
+from .core.password_executor import password_executor
 from .core.settings import settings
+from .db.plant_hist_buffer import plant_hist_buffer
 
 app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
 handler = Mangum(app)
 
 
+@app.on_event("startup")
+async def start_plant_hist_buffer():
+    if settings.PLANT_HIST_WRITE_BEHIND:
+        plant_hist_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_plant_hist_buffer():
+    # flush rows left in the buffer before process exits
+    await plant_hist_buffer.stop()
+
+
+@app.on_event("shutdown")
+def stop_password_executor():
+    password_executor.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    if settings.DATABASE_ASYNC:
+        from .db.async_session import get_async_engine
+
+        await get_async_engine().dispose()
+
+
 @app.get("/healthcheck", tags=[Tag.HEALTHCHECK])
 def healthcheck():
     return {"status": "ok"}
@@ -39,11 +70,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(login_router)
 app.include_router(users_router)
 app.include_router(plants_router)
+if settings.DATABASE_ASYNC:
+    # asyncio extension of sqlalchemy is slow to import, so it is loaded on demand
+    from .api.endpoints.async_plants import router_ingest as async_plants_router_ingest
+
+    app.include_router(async_plants_router_ingest)
+else:
+    app.include_router(plants_router_ingest)
 app.include_router(devices_router)
 app.include_router(plants_router_historical)
 app.include_router(sensor_threshold_router)
+if settings.DIAGNOSTICS_ENABLED:
+    app.include_router(diagnostics_router)
+app.include_router(dashboard_router)
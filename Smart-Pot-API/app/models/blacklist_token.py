@@ -1,9 +1,21 @@
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, Index, Integer, String
 
 from ..db.base import Base
 
 
 class BlackListToken(Base):
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String, nullable=False, index=True, unique=True)
+    token = Column(String, nullable=False)
+    # sha256 hex digest of the token, hash index is smaller than index of the JWT
+    token_digest = Column(String(64), nullable=False)
     invalidated_at = Column(DateTime, nullable=False)
+    # exp claim of the token, expired rows are pruned
+    expires_at = Column(DateTime, nullable=False, index=True)
+    # jti claim, tokens issued before jti claim was added have none
+    jti = Column(String, nullable=True, index=True, unique=True)
+
+    __table_args__ = (
+        Index(
+            "ix_blacklisttoken_token_digest", "token_digest", postgresql_using="hash"
+        ),
+    )
@@ -1,7 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import declared_attr, relationship
 
 from ..db.base import Base
 
@@ -27,10 +27,44 @@ class Plant(Base):
 
 
 class Plant_Hist(Base):
-    id = Column(Integer, primary_key=True, index=True)
+    # table is partitioned by month of added_at, see alembic migrations and
+    # app.db.maintenance, so added_at is a part of the primary key
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     temperature = Column(Float, nullable=False)
     lux = Column(Float, nullable=False)
     humidity = Column(Float, nullable=False)
-    added_at = Column(DateTime, default=datetime.utcnow())
+    added_at = Column(DateTime, primary_key=True, default=datetime.utcnow())
     plant_id = Column(Integer, ForeignKey('plant.id'))
     plant = relationship("Plant", back_populates="plant_hist", uselist=False)
+
+    __table_args__ = (
+        Index("ix_plant_hist_plant_id_added_at", plant_id, added_at.desc()),
+    )
+
+
+class PlantHistRollupMixin:
+    """Aggregates of plant history rows added in the same time bucket"""
+
+    @declared_attr
+    def plant_id(cls):
+        return Column(Integer, ForeignKey('plant.id'), primary_key=True)
+
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    lux_min = Column(Float, nullable=False)
+    lux_max = Column(Float, nullable=False)
+    lux_sum = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+    humidity_sum = Column(Float, nullable=False)
+
+
+class Plant_Hist_Hourly(PlantHistRollupMixin, Base):
+    pass
+
+
+class Plant_Hist_Daily(PlantHistRollupMixin, Base):
+    pass
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Integer, String, text
 from sqlalchemy.orm import relationship
 
 from ..db.base import Base
@@ -14,5 +14,7 @@ class User(Base):
     is_active = Column(Boolean, default=False)
     language = Column(String, nullable=True)
     timezone = Column(String, nullable=True)
+    # tokens issued with older version are rejected, bumped on logout and reset
+    token_version = Column(Integer, nullable=False, default=0, server_default=text("0"))
     plants = relationship("Plant", back_populates="owner_id")
     devices = relationship("Device", back_populates="user")
@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class SensorStatus(BaseModel):
+    """Current sensor value compared with plant's threshold"""
+
+    value: Optional[float] = None
+    min_value: Optional[int] = None
+    max_value: Optional[int] = None
+    in_range: Optional[bool] = Field(
+        default=None, description="Empty when plant has no threshold for sensor"
+    )
+
+
+class SparklinePoint(BaseModel):
+    """Hourly average of sensors"""
+
+    bucket: datetime
+    temperature: float
+    lux: float
+    humidity: float
+
+
+class DashboardPlant(BaseModel):
+    """Plant summary for dashboard"""
+
+    id: int
+    name: str
+    imgsrc: Optional[str] = None
+    device_id: Optional[str] = None
+    last_updated: Optional[datetime] = None
+    temperature: SensorStatus
+    lux: SensorStatus
+    humidity: SensorStatus
+    sparkline: List[SparklinePoint] = Field(
+        default=[], description="Hourly averages from last 24 hours"
+    )
@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 
 from ..schemas.device import Device
 from ..schemas.sensor_threshold import SensorThreshold
@@ -35,6 +35,35 @@ class PlantUpdate(PlantBase):
     device_token: str
 
 
+class PlantReading(BaseModel):
+    """Single timestamped reading buffered on the device"""
+
+    sensors: Sensor
+    last_updated: datetime
+
+    @validator("last_updated")
+    def convert_to_naive_utc(cls, value: datetime) -> datetime:
+        # readings are compared with naive UTC timestamps from the database
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class PlantDeviceReadings(BaseModel):
+    """Readings collected by one device between uploads"""
+
+    device_token: str
+    readings: List[PlantReading] = Field(
+        ..., min_items=1, max_items=1000, description="Device's buffered readings"
+    )
+
+
+class PlantBatchUpdate(BaseModel):
+    """Plant class for receive buffered readings from many devices at once"""
+
+    devices: List[PlantDeviceReadings] = Field(..., min_items=1, max_items=100)
+
+
 class ChangePlantName(BaseModel):
     name: str
 
@@ -78,3 +107,40 @@ class PlantHist(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class PlantHistRollup(BaseModel):
+    """Aggregated plant history of one hour or one day"""
+
+    plant_id: int
+    bucket: datetime = Field(..., description="Start of the bucket in UTC")
+    count: int = Field(..., description="Number of readings in the bucket")
+    temperature_min: float
+    temperature_max: float
+    temperature_avg: float
+    lux_min: float
+    lux_max: float
+    lux_avg: float
+    humidity_min: float
+    humidity_max: float
+    humidity_avg: float
+
+    class Config:
+        orm_mode = True
+
+
+class SensorStatistics(BaseModel):
+    min: float
+    max: float
+    mean: float
+    p95: float = Field(..., description="95th percentile")
+
+
+class PlantHistBucket(BaseModel):
+    """Statistics of plant history readings in one time bucket"""
+
+    bucket: datetime = Field(..., description="Start of the bucket")
+    count: int = Field(..., description="Number of readings in the bucket")
+    temperature: SensorStatistics
+    lux: SensorStatistics
+    humidity: SensorStatistics
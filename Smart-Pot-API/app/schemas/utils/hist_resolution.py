@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class HistResolution(str, Enum):
+    RAW = "raw"
+    HOUR = "hour"
+    DAY = "day"
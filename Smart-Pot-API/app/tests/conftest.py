@@ -1,15 +1,30 @@
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List
+
 import pytest
 import sqlalchemy as sa
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 
-from ..core.dependencies import get_db
+from ..core.dependencies import get_db, get_read_db
 from ..core.settings import settings
-from ..crud.crud_users import get_current_active_user, get_current_user
+from ..crud.crud_users import (
+    get_current_active_user,
+    get_current_active_user_snapshot,
+    get_current_user,
+    get_current_user_snapshot,
+    user_snapshot_cache,
+)
 from ..db.base import Base
 from ..main import app
+from ..models.device import Device
+from ..models.plant import Plant
+from ..models.user import User
 
 
 def get_engine() -> Engine:
@@ -48,9 +63,103 @@ def override_get_db(db_engine):
     connection.close()
 
 
+@pytest.fixture(scope="function")
+def assert_max_queries(db_engine):
+    """Fail when block executes more SQL statements than expected, e.g. N+1 loads
+
+    with assert_max_queries(5):
+        client.get("/api/v1/plants/", headers=headers)
+    """
+
+    @contextmanager
+    def assert_max_queries(max_queries: int):
+        statements: List[str] = []
+
+        def count_statement(conn, cursor, statement, parameters, context, many):
+            # savepoints come from test transaction, not from tested code
+            if not statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE")):
+                statements.append(statement)
+
+        sa.event.listen(db_engine, "before_cursor_execute", count_statement)
+        try:
+            yield statements
+        finally:
+            sa.event.remove(db_engine, "before_cursor_execute", count_statement)
+        assert len(statements) <= max_queries, (
+            f"Expected at most {max_queries} queries, executed {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+    return assert_max_queries
+
+
+async def create_async_test_plant(db) -> Plant:
+    user = User(full_name="Async User", email="async@example.com", hashed_password="-")
+    db.add(user)
+    await db.flush()
+    device = Device(
+        id="ESP-async",
+        name="Async Device",
+        type="ESP",
+        user_id=user.id,
+        device_token="asyncDeviceToken",
+    )
+    plant = Plant(
+        name="Async Plant",
+        imgsrc="",
+        humidity=0.0,
+        lux=0.0,
+        temperature=0.0,
+        last_updated=datetime(2023, 1, 1),
+        device_id=device.id,
+        user_id=user.id,
+    )
+    db.add_all([device, plant])
+    await db.commit()
+    return plant
+
+
+@pytest.fixture(scope="function")
+def run_async_in_transaction(db_engine):
+    """Run test coroutine with AsyncSession and test plant, changes are rolled back.
+
+    Async tests run in asyncio.run, so asyncpg connection is used in one loop.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async def run_test(test: Callable[[Any, Plant], Awaitable[None]]) -> None:
+        async_engine = create_async_engine(
+            settings.TEST_DATABASE_URL.replace(
+                "postgresql://", "postgresql+asyncpg://", 1
+            ),
+            poolclass=NullPool,
+        )
+        try:
+            async with async_engine.connect() as connection:
+                transaction = await connection.begin()
+                # commits of tested code release savepoints of test transaction
+                db = AsyncSession(
+                    bind=connection,
+                    expire_on_commit=False,
+                    join_transaction_mode="create_savepoint",
+                )
+                try:
+                    await test(db, await create_async_test_plant(db))
+                finally:
+                    await db.close()
+                    await transaction.rollback()
+        finally:
+            await async_engine.dispose()
+
+    yield lambda test: asyncio.run(run_test(test))
+
+
 @pytest.fixture(scope="function")
 def client(override_get_db):
     app.dependency_overrides[get_db] = lambda: override_get_db
+    # tests have no replica, reads use the same test transaction
+    app.dependency_overrides[get_read_db] = lambda: override_get_db
+    user_snapshot_cache.clear()
     with TestClient(app) as client:
         yield client
 
@@ -60,7 +169,12 @@ def client_without_authentication():
     def skip_authentication():
         return None
 
-    for dependency in [get_current_active_user, get_current_user]:
+    for dependency in [
+        get_current_active_user,
+        get_current_user,
+        get_current_active_user_snapshot,
+        get_current_user_snapshot,
+    ]:
         app.dependency_overrides[dependency] = skip_authentication
     with TestClient(app) as client:
         yield client
@@ -95,7 +209,7 @@ def retrieve_test_user_token_headers(override_get_db, register_test_user):
         override_get_db, register_test_user, state=True
     )
     test_user_email = register_test_user.email
-    token = create_access_token(subject=test_user_email)
+    token = create_access_token(subject=test_user_email, user=register_test_user)
     headers = {"Authorization": f"Bearer {token}"}
     yield headers, token
 
@@ -109,3 +223,27 @@ def destroy_test_user_token(
     yield destroy_access_token(
         override_get_db, retrieve_test_user_token_headers[1], register_test_user
     )
+
+
+@pytest.fixture(scope="function")
+def register_test_device(override_get_db, register_test_user):
+    from ..core.security import create_device_token
+    from ..crud.crud_devices import create_new_device
+    from ..schemas.device import DeviceCreate
+
+    new_device = DeviceCreate(name="Test Device", type="ESP")
+    yield create_new_device(
+        new_device,
+        override_get_db,
+        register_test_user.id,
+        device_token=create_device_token(length_token=15),
+    )
+
+
+@pytest.fixture(scope="function")
+def register_test_plant(override_get_db, register_test_user, register_test_device):
+    from ..crud.crud_plants import create_new_plant
+    from ..schemas.plant import PlantCreate
+
+    new_plant = PlantCreate(name="Test Plant", device_id=register_test_device.id)
+    yield create_new_plant(new_plant, override_get_db, register_test_user.id)
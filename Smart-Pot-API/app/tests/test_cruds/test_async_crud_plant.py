@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from ...crud.async_crud_plants import update_plant, update_plants_batch
+from ...models.plant import Plant as PlantDB
+from ...models.plant import Plant_Hist
+from ...schemas.plant import PlantBatchUpdate, PlantUpdate
+
+
+def create_readings(count: int, start_at: datetime):
+    return [
+        {
+            "sensors": {"humidity": index, "lux": index, "temperature": index},
+            "last_updated": start_at + timedelta(minutes=index),
+        }
+        for index in range(count)
+    ]
+
+
+async def get_plant_hist_temperatures(db, plant_id: int):
+    return list(
+        await db.scalars(
+            select(Plant_Hist.temperature)
+            .filter(Plant_Hist.plant_id == plant_id)
+            .order_by(Plant_Hist.added_at.desc(), Plant_Hist.id.desc())
+        )
+    )
+
+
+class TestAsyncCrudPlant:
+    @pytest.fixture(autouse=True)
+    def setup(self, run_async_in_transaction):
+        self.run = run_async_in_transaction
+
+    @pytest.mark.integration
+    def test_update_plant_valid(self):
+        async def test(db, test_plant):
+            updated_at = test_plant.last_updated + timedelta(minutes=1)
+            updated_plant = PlantUpdate(
+                sensors={"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+                device_token="asyncDeviceToken",
+                last_updated=updated_at,
+            )
+            plant = await update_plant(db, updated_plant)
+            assert plant.temperature == 30.0
+            assert plant.last_updated == updated_at
+            assert plant.device.device_token == "asyncDeviceToken"
+            assert await get_plant_hist_temperatures(db, test_plant.id) == [0.0]
+
+        self.run(test)
+
+    @pytest.mark.integration
+    def test_update_plant_invalid_device_token(self):
+        async def test(db, test_plant):
+            updated_plant = PlantUpdate(
+                sensors={"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+                device_token="invalid_token",
+            )
+            with pytest.raises(HTTPException) as exception_info:
+                await update_plant(db, updated_plant)
+            assert "User cannot update plant with not exisiting device" in str(
+                exception_info.value
+            )
+
+        self.run(test)
+
+    @pytest.mark.integration
+    def test_update_plants_batch_valid(self):
+        async def test(db, test_plant):
+            start_at = test_plant.last_updated + timedelta(minutes=1)
+            plants_batch = PlantBatchUpdate(
+                devices=[
+                    {
+                        "device_token": "asyncDeviceToken",
+                        "readings": create_readings(5, start_at),
+                    }
+                ]
+            )
+            message = await update_plants_batch(db, plants_batch)
+            assert message == {"message": "Saved 5 readings for 1 devices"}
+            plant = await db.get(PlantDB, test_plant.id, populate_existing=True)
+            assert plant.temperature == 4
+            assert plant.last_updated == start_at + timedelta(minutes=4)
+            assert await get_plant_hist_temperatures(db, test_plant.id) == [
+                3,
+                2,
+                1,
+                0,
+                0,
+            ]
+
+        self.run(test)
+
+    @pytest.mark.integration
+    def test_update_plants_batch_invalid_device_token(self):
+        async def test(db, test_plant):
+            plants_batch = PlantBatchUpdate(
+                devices=[
+                    {
+                        "device_token": "invalid_token",
+                        "readings": create_readings(1, datetime.utcnow()),
+                    }
+                ]
+            )
+            with pytest.raises(HTTPException) as exception_info:
+                await update_plants_batch(db, plants_batch)
+            assert "Cannot find plant with that device" in str(exception_info.value)
+
+        self.run(test)
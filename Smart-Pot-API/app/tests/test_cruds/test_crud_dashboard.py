@@ -0,0 +1,31 @@
+import pytest
+
+from ...crud.crud_dashboard import get_user_dashboard
+from ...models.sensor_threshold import SensorThreshold
+
+
+class TestCrudDashboard:
+    @pytest.fixture(autouse=True)
+    def setup(self, override_get_db, register_test_user, register_test_plant):
+        self.db = override_get_db
+        self.user = register_test_user
+        self.plant = register_test_plant
+
+    @pytest.mark.integration
+    def test_get_user_dashboard(self):
+        self.db.add(
+            SensorThreshold(
+                threshold_id="temp", min_value=10, max_value=30, plant_id=self.plant.id
+            )
+        )
+        self.db.commit()
+        dashboard = get_user_dashboard(self.db, self.user.id)
+        assert [plant["id"] for plant in dashboard] == [self.plant.id]
+        assert dashboard[0]["temperature"] == {
+            "value": 0.0,
+            "min_value": 10,
+            "max_value": 30,
+            "in_range": False,
+        }
+        assert dashboard[0]["lux"] == {"value": 0.0}
+        assert dashboard[0]["sparkline"] == []
@@ -0,0 +1,275 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from pydantic.error_wrappers import ValidationError
+
+from ...core.pagination import HistCursor
+from ...crud.crud_plant_hist import (
+    get_plant_hist_buckets,
+    get_plant_hist_rollups_limit,
+    rebuild_plant_hist_rollups,
+)
+from ...crud.crud_plants import (
+    get_plant_by_id,
+    get_user_historical_plant_data_limit,
+    update_plant,
+    update_plants_batch,
+)
+from ...db.archive import LocalArchiveStorage, archive_plant_hist_month
+from ...models.plant import Plant_Hist
+from ...schemas.plant import PlantBatchUpdate, PlantUpdate
+from ...schemas.utils.hist_resolution import HistResolution
+
+
+class TestCrudPlant:
+    @pytest.fixture(autouse=True)
+    def setup(self, override_get_db, register_test_device, register_test_plant):
+        self.db = override_get_db
+        self.device = register_test_device
+        self.plant = register_test_plant
+
+    def create_readings(self, count: int, start_at: datetime):
+        return [
+            {
+                "sensors": {"humidity": index, "lux": index, "temperature": index},
+                "last_updated": start_at + timedelta(minutes=index),
+            }
+            for index in range(count)
+        ]
+
+    @pytest.mark.integration
+    def test_update_plant_valid(self):
+        updated_at = self.plant.last_updated + timedelta(minutes=1)
+        updated_plant = PlantUpdate(
+            sensors={"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+            device_token=self.device.device_token,
+            last_updated=updated_at,
+        )
+        plant = update_plant(self.db, updated_plant)
+        assert plant.temperature == 30.0
+        assert plant.last_updated == updated_at
+        assert plant.device.device_token == self.device.device_token
+        plant_hist = get_user_historical_plant_data_limit(self.db, self.plant.id, 10)
+        assert len(plant_hist) == 1
+        assert plant_hist[0].temperature == 0.0
+
+    @pytest.mark.integration
+    def test_update_plant_invalid_device_token(self):
+        updated_plant = PlantUpdate(
+            sensors={"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+            device_token="invalid_token",
+        )
+        with pytest.raises(HTTPException) as exception_info:
+            update_plant(self.db, updated_plant)
+        assert "User cannot update plant with not exisiting device" in str(
+            exception_info.value
+        )
+
+    @pytest.mark.integration
+    def test_update_plants_batch_valid(self):
+        start_at = self.plant.last_updated + timedelta(minutes=1)
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": self.device.device_token,
+                    "readings": self.create_readings(5, start_at),
+                }
+            ]
+        )
+        message = update_plants_batch(self.db, plants_batch)
+        assert message == {"message": "Saved 5 readings for 1 devices"}
+        plant = get_plant_by_id(self.db, self.plant.id)
+        assert plant.temperature == 4
+        assert plant.last_updated == start_at + timedelta(minutes=4)
+        plant_hist = get_user_historical_plant_data_limit(self.db, self.plant.id, 10)
+        assert [hist.temperature for hist in plant_hist] == [3, 2, 1, 0, 0]
+
+    @pytest.mark.integration
+    def test_update_plants_batch_unordered_readings(self):
+        start_at = self.plant.last_updated + timedelta(minutes=1)
+        readings = self.create_readings(3, start_at)
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": self.device.device_token,
+                    "readings": list(reversed(readings)),
+                }
+            ]
+        )
+        update_plants_batch(self.db, plants_batch)
+        plant = get_plant_by_id(self.db, self.plant.id)
+        assert plant.last_updated == start_at + timedelta(minutes=2)
+
+    @pytest.mark.integration
+    def test_update_plants_batch_invalid_device_token(self):
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": "invalid_token",
+                    "readings": self.create_readings(1, datetime.utcnow()),
+                }
+            ]
+        )
+        with pytest.raises(HTTPException) as exception_info:
+            update_plants_batch(self.db, plants_batch)
+        assert "Cannot find plant with that device" in str(exception_info.value)
+
+    @pytest.mark.integration
+    def test_update_plants_batch_readings_with_offset(self):
+        start_at = self.plant.last_updated + timedelta(hours=1)
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": self.device.device_token,
+                    "readings": [
+                        {
+                            "sensors": {"humidity": 1, "lux": 1, "temperature": 1},
+                            "last_updated": start_at.isoformat() + "Z",
+                        },
+                        {
+                            "sensors": {"humidity": 2, "lux": 2, "temperature": 2},
+                            "last_updated": (start_at + timedelta(hours=2)).isoformat()
+                            + "+01:00",
+                        },
+                    ],
+                }
+            ]
+        )
+        message = update_plants_batch(self.db, plants_batch)
+        assert message == {"message": "Saved 2 readings for 1 devices"}
+        plant = get_plant_by_id(self.db, self.plant.id)
+        assert plant.temperature == 2
+        assert plant.last_updated == start_at + timedelta(hours=1)
+
+    @pytest.mark.integration
+    def test_update_plants_batch_without_readings(self):
+        with pytest.raises(ValidationError) as exception_info:
+            PlantBatchUpdate(
+                devices=[{"device_token": self.device.device_token, "readings": []}]
+            )
+        assert "ensure this value has at least 1 items" in str(exception_info.value)
+
+    @pytest.mark.integration
+    def test_plant_hist_rollups_updated_by_ingest(self):
+        start_at = self.plant.last_updated + timedelta(minutes=1)
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": self.device.device_token,
+                    "readings": self.create_readings(5, start_at),
+                }
+            ]
+        )
+        update_plants_batch(self.db, plants_batch)
+        hourly = get_plant_hist_rollups_limit(
+            self.db, self.plant.id, HistResolution.HOUR, 10
+        )
+        daily = get_plant_hist_rollups_limit(
+            self.db, self.plant.id, HistResolution.DAY, 10
+        )
+        assert sum(rollup.count for rollup in hourly) == 5
+        assert sum(rollup.count for rollup in daily) == 5
+        assert max(rollup.temperature_max for rollup in hourly) == 3
+
+        rebuild_plant_hist_rollups(self.db, plant_id=self.plant.id)
+        rebuilt_hourly = get_plant_hist_rollups_limit(
+            self.db, self.plant.id, HistResolution.HOUR, 10
+        )
+        assert rebuilt_hourly == hourly
+
+    @pytest.mark.integration
+    def test_plant_hist_keyset_pages(self):
+        start_at = self.plant.last_updated + timedelta(minutes=1)
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": self.device.device_token,
+                    "readings": self.create_readings(6, start_at),
+                }
+            ]
+        )
+        update_plants_batch(self.db, plants_batch)
+        first_page = get_user_historical_plant_data_limit(self.db, self.plant.id, 3)
+        last_row = first_page[-1]
+        second_page = get_user_historical_plant_data_limit(
+            self.db, self.plant.id, 3, HistCursor(last_row.added_at, last_row.id)
+        )
+        assert [hist.temperature for hist in first_page] == [4, 3, 2]
+        assert [hist.temperature for hist in second_page] == [1, 0, 0]
+
+    @pytest.mark.integration
+    def test_plant_hist_buckets_in_user_timezone(self):
+        # 23:00 UTC is midnight in Warsaw in winter
+        for added_at, temperature in [
+            (datetime(2023, 1, 1, 22, 0), 10.0),
+            (datetime(2023, 1, 1, 22, 59), 20.0),
+            (datetime(2023, 1, 1, 23, 0), 30.0),
+            (datetime(2023, 1, 2, 10, 0), 40.0),
+        ]:
+            self.db.add(
+                Plant_Hist(
+                    temperature=temperature,
+                    lux=1.0,
+                    humidity=1.0,
+                    added_at=added_at,
+                    plant_id=self.plant.id,
+                )
+            )
+        self.db.commit()
+        buckets = get_plant_hist_buckets(
+            self.db,
+            self.plant.id,
+            datetime(2023, 1, 1),
+            datetime(2023, 1, 3),
+            60 * 24,
+            "Europe/Warsaw",
+        )
+        assert [bucket["bucket"] for bucket in buckets] == [
+            datetime(2022, 12, 31, 23, tzinfo=timezone.utc),
+            datetime(2023, 1, 1, 23, tzinfo=timezone.utc),
+        ]
+        assert [bucket["count"] for bucket in buckets] == [2, 2]
+        first_bucket = buckets[0]["temperature"]
+        assert first_bucket["min"] == 10.0
+        assert first_bucket["max"] == 20.0
+        assert first_bucket["mean"] == 15.0
+        assert first_bucket["p95"] == pytest.approx(19.5)
+
+    @pytest.mark.integration
+    def test_archive_deletes_only_archived_rows(self, tmp_path):
+        db = self.db
+        plant_id = self.plant.id
+        for day in range(1, 4):
+            db.add(
+                Plant_Hist(
+                    temperature=20.0,
+                    lux=1.0,
+                    humidity=1.0,
+                    added_at=datetime(2020, 5, day),
+                    plant_id=plant_id,
+                )
+            )
+        db.commit()
+
+        class LateCommitStorage(LocalArchiveStorage):
+            def write(self, key, data):
+                super().write(key, data)
+                # row with lower id committed after the archive was exported
+                db.add(
+                    Plant_Hist(
+                        id=-1,
+                        temperature=20.0,
+                        lux=1.0,
+                        humidity=1.0,
+                        added_at=datetime(2020, 5, 4),
+                        plant_id=plant_id,
+                    )
+                )
+                db.commit()
+
+        storage = LateCommitStorage(str(tmp_path))
+        deleted_rows = archive_plant_hist_month(db, storage, plant_id, date(2020, 5, 1))
+        assert deleted_rows == 3
+        remaining_rows = get_user_historical_plant_data_limit(db, plant_id, 10)
+        assert [row.id for row in remaining_rows] == [-1]
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ...crud.crud_token import get_token_by_token, prune_blacklist_tokens, token_digest
+from ...models.blacklist_token import BlackListToken
+
+
+class TestCrudToken:
+    @pytest.fixture(autouse=True)
+    def setup(self, override_get_db):
+        self.db = override_get_db
+
+    def add_token(self, token: str, expires_at: datetime) -> None:
+        self.db.add(
+            BlackListToken(
+                token=token,
+                token_digest=token_digest(token),
+                invalidated_at=datetime.utcnow(),
+                expires_at=expires_at,
+            )
+        )
+        self.db.commit()
+
+    @pytest.mark.integration
+    def test_prune_blacklist_tokens_deletes_only_expired(self):
+        now = datetime.utcnow()
+        for index in range(5):
+            self.add_token(f"expired{index}", now - timedelta(minutes=1))
+        self.add_token("live", now + timedelta(minutes=30))
+        assert prune_blacklist_tokens(self.db, chunk_size=2) == 5
+        assert get_token_by_token(self.db, "live") is not None
+        assert get_token_by_token(self.db, "expired0") is None
@@ -6,17 +6,22 @@ from faker import Faker
 from fastapi import HTTPException
 from pydantic.error_wrappers import ValidationError
 
+from ...core.security import access_token_cache, access_token_digest
 from ...crud.crud_users import (
     control_user_activity,
     create_new_user,
     delete_user,
     get_current_active_user,
+    get_current_active_user_snapshot,
     get_current_user,
+    get_current_user_snapshot,
     get_user_by_email,
     is_active,
+    revoke_user_tokens,
     update_user_language,
     update_user_timezone,
     user_authentication,
+    user_snapshot_cache,
     validate_user_timezone,
 )
 from ...models.user import User as UserModel
@@ -254,6 +259,40 @@ class TestCrudUser:
             exception_info.value.detail
         )
 
+    @pytest.mark.integration
+    def test_get_current_user_revoked_tokens(self):
+        revoke_user_tokens(self.db, self.user)
+        with pytest.raises(HTTPException) as exception_info:
+            get_current_user(self.token, self.db)
+        assert "Could not validate credentials" in str(exception_info.value.detail)
+
+    @pytest.mark.integration
+    def test_get_current_user_token_without_user_id(self):
+        from ...core.security import create_access_token
+
+        token = create_access_token(subject=self.user.email)
+        assert get_current_user(token, self.db).id == self.user.id
+
+    @pytest.mark.integration
+    def test_destroyed_token_is_evicted_from_cache(self, destroy_test_user_token):
+        assert access_token_cache.get(access_token_digest(self.token)) is None
+
+    @pytest.mark.integration
+    def test_get_current_user_snapshot_is_cached(self):
+        snapshot = get_current_user_snapshot(self.token, self.db)
+        assert snapshot.id == self.user.id
+        assert user_snapshot_cache.get(self.user.id) == snapshot
+
+    @pytest.mark.integration
+    def test_user_snapshot_is_invalidated_on_update(self):
+        get_current_user_snapshot(self.token, self.db)
+        control_user_activity(self.db, self.user, state=False)
+        with pytest.raises(HTTPException) as exception_info:
+            get_current_active_user_snapshot(
+                get_current_user_snapshot(self.token, self.db)
+            )
+        assert "Inactive user" in str(exception_info.value.detail)
+
     @pytest.mark.unit
     def test_user_delete_valid(self):
         message = delete_user(self.db, self.user)
@@ -0,0 +1,84 @@
+import importlib.util
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from ...db.partitions import (
+    create_plant_hist_partitions,
+    detach_plant_hist_partitions,
+    get_plant_hist_partitions,
+)
+
+MIGRATION_PATH = next(
+    (Path(__file__).resolve().parents[3] / "alembic" / "versions").glob(
+        "*_partition_plant_hist_by_month.py"
+    )
+)
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("partition_migration", MIGRATION_PATH)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration
+
+
+def insert_plant_hist(connection, added_at: datetime) -> None:
+    connection.execute(
+        text(
+            "INSERT INTO plant_hist (temperature, lux, humidity, added_at) "
+            "VALUES (20.0, 100.0, 50.0, :added_at)"
+        ),
+        {"added_at": added_at},
+    )
+
+
+def count_rows(connection, table_name: str) -> int:
+    return connection.execute(text(f"SELECT count(*) FROM {table_name}")).scalar()
+
+
+class TestPlantHistPartitions:
+    @pytest.fixture(autouse=True)
+    def setup(self, db_engine):
+        # DDL is transactional in Postgres, migration is rolled back after test
+        self.connection = db_engine.connect()
+        transaction = self.connection.begin()
+        # tables of tests are created from models, the index was added by the
+        # migration itself
+        self.connection.execute(text("DROP INDEX ix_plant_hist_plant_id_added_at"))
+        insert_plant_hist(self.connection, datetime(2023, 5, 10))
+        with Operations.context(MigrationContext.configure(self.connection)):
+            load_migration().upgrade()
+        yield
+        transaction.rollback()
+        self.connection.close()
+
+    @pytest.mark.integration
+    def test_migration_moves_rows_to_monthly_partitions(self):
+        partitions = get_plant_hist_partitions(self.connection)
+        assert "plant_hist_default" in partitions
+        assert "plant_hist_y2023m05" in partitions
+        assert count_rows(self.connection, "plant_hist_y2023m05") == 1
+        assert count_rows(self.connection, "plant_hist_default") == 0
+
+    @pytest.mark.integration
+    def test_partition_is_created_for_rows_in_default_partition(self):
+        insert_plant_hist(self.connection, datetime(2099, 1, 15))
+        insert_plant_hist(self.connection, datetime(2099, 2, 15))
+        created = create_plant_hist_partitions(self.connection, date(2099, 1, 1), 1)
+        assert created == ["plant_hist_y2099m01"]
+        assert count_rows(self.connection, "plant_hist_y2099m01") == 1
+        assert count_rows(self.connection, "plant_hist_default") == 1
+        assert "plant_hist_default" in get_plant_hist_partitions(self.connection)
+        assert count_rows(self.connection, "plant_hist") == 3
+
+    @pytest.mark.integration
+    def test_detach_old_partitions(self):
+        detached = detach_plant_hist_partitions(self.connection, date(2023, 6, 1))
+        assert detached == ["plant_hist_y2023m05"]
+        assert count_rows(self.connection, "plant_hist") == 0
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from ...api.endpoints.async_plants import router_ingest
+from ...core.dependencies import get_async_db
+
+
+def create_async_app(db) -> FastAPI:
+    # async routes replace the sync ones only when DATABASE_ASYNC is on, so
+    # they are tested in own app
+    async_app = FastAPI()
+    async_app.include_router(router_ingest)
+    async_app.dependency_overrides[get_async_db] = lambda: db
+    return async_app
+
+
+class TestEndpointAsyncPlants:
+    @pytest.fixture(autouse=True)
+    def setup(self, run_async_in_transaction):
+        self.run = run_async_in_transaction
+
+    @pytest.mark.integration
+    def test_update_plant(self):
+        async def test(db, test_plant):
+            updated_at = test_plant.last_updated + timedelta(minutes=1)
+            async with httpx.AsyncClient(
+                app=create_async_app(db), base_url="http://test"
+            ) as client:
+                response = await client.patch(
+                    "/api/v1/plants/update-plant",
+                    json={
+                        "sensors": {"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+                        "device_token": "asyncDeviceToken",
+                        "last_updated": updated_at.isoformat(),
+                    },
+                )
+            assert response.status_code == 200
+            assert response.json()["temperature"] == 30.0
+            assert response.json()["device"]["id"] == "ESP-async"
+
+        self.run(test)
+
+    @pytest.mark.integration
+    def test_update_plants_batch(self):
+        async def test(db, test_plant):
+            readings = [
+                {
+                    "sensors": {"humidity": index, "lux": index, "temperature": index},
+                    "last_updated": (
+                        datetime(2023, 1, 1) + timedelta(minutes=index + 1)
+                    ).isoformat(),
+                }
+                for index in range(3)
+            ]
+            async with httpx.AsyncClient(
+                app=create_async_app(db), base_url="http://test"
+            ) as client:
+                response = await client.patch(
+                    "/api/v1/plants/update-plants-batch",
+                    json={
+                        "devices": [
+                            {"device_token": "asyncDeviceToken", "readings": readings}
+                        ]
+                    },
+                )
+            assert response.status_code == 200
+            assert response.json() == {"message": "Saved 3 readings for 1 devices"}
+
+        self.run(test)
+
+    @pytest.mark.integration
+    def test_update_plant_invalid_device_token(self):
+        async def test(db, test_plant):
+            async with httpx.AsyncClient(
+                app=create_async_app(db), base_url="http://test"
+            ) as client:
+                response = await client.patch(
+                    "/api/v1/plants/update-plant",
+                    json={
+                        "sensors": {"humidity": 10.0, "lux": 20.0, "temperature": 30.0},
+                        "device_token": "invalid_token",
+                    },
+                )
+            assert response.status_code == 404
+
+        self.run(test)
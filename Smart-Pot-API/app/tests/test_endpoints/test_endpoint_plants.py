@@ -0,0 +1,138 @@
+import pytest
+from sqlalchemy import select
+
+from ...core.settings import settings
+from ...crud.crud_devices import create_new_device
+from ...crud.crud_plants import create_new_plant
+from ...crud.crud_users import create_new_user
+from ...models.plant import Plant
+from ...models.sensor_threshold import SensorThreshold
+from ...schemas.device import DeviceCreate
+from ...schemas.plant import PlantCreate
+from ...schemas.user import UserCreate
+
+# token check and user lookup, then plants, devices and thresholds
+PLANTS_LIST_MAX_QUERIES = 6
+
+
+class TestEndpointPlants:
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        override_get_db,
+        client,
+        register_test_user,
+        retrieve_test_user_token_headers,
+    ):
+        self.db = override_get_db
+        self.client = client
+        self.user = register_test_user
+        self.headers = retrieve_test_user_token_headers[0]
+
+    def create_plants(self):
+        for index, threshold_id in enumerate(("temp", "lux", "hum")):
+            device = create_new_device(
+                DeviceCreate(name=f"Test Device {index}", type="ESP"),
+                self.db,
+                self.user.id,
+                device_token=f"test-device-token-{index}",
+            )
+            plant = create_new_plant(
+                PlantCreate(name=f"Test Plant {index}", imgsrc="", device_id=device.id),
+                self.db,
+                self.user.id,
+            )
+            self.db.add(
+                SensorThreshold(
+                    threshold_id=threshold_id,
+                    min_value=0,
+                    max_value=30,
+                    plant_id=plant.id,
+                )
+            )
+        self.db.commit()
+        self.db.expire_all()
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "/api/v1/plants/",
+            "/api/v1/users/me",
+            "/api/v1/sensor-threshold/get-current-user-thresholds",
+        ],
+    )
+    def test_user_plants_without_n_plus_one_queries(self, assert_max_queries, url):
+        self.create_plants()
+        with assert_max_queries(PLANTS_LIST_MAX_QUERIES):
+            response = self.client.get(url, headers=self.headers)
+        assert response.status_code == 200
+
+    def create_other_users_plant(self):
+        other_user = create_new_user(
+            self.db,
+            UserCreate(
+                full_name="Other User",
+                email="other@example.com",
+                password="XS#1sdf111#!",
+            ),
+        )
+        device = create_new_device(
+            DeviceCreate(name="Other Device", type="ESP"),
+            self.db,
+            other_user.id,
+            device_token="other-device-token",
+        )
+        return create_new_plant(
+            PlantCreate(name="Other Plant", imgsrc="", device_id=device.id),
+            self.db,
+            other_user.id,
+        )
+
+    @pytest.mark.integration
+    def test_aggregated_history_of_other_users_plant(self):
+        plant = self.create_other_users_plant()
+        response = self.client.get(
+            f"/api/v1/hist-plants/get-aggregated/{plant.id}",
+            params={"start_date": "2023-01-01"},
+            headers=self.headers,
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize(
+        "path, params",
+        [
+            ("get-by-limit", {"limit": 10}),
+            ("get-by-limit", {"limit": 10, "max_points": 3}),
+            ("get-by-limit", {"limit": 10, "resolution": "hour"}),
+            ("get-by-date", {"start_date": "2023-01-01"}),
+            ("get-by-date", {"start_date": "2023-01-01", "max_points": 3}),
+            ("get-by-date", {"start_date": "2023-01-01", "resolution": "day"}),
+            ("get-by-limit", {"limit": 10, "format": "columnar"}),
+            ("get-by-date", {"start_date": "2023-01-01", "format": "columnar"}),
+        ],
+    )
+    def test_history_of_other_users_plant(self, path, params):
+        plant = self.create_other_users_plant()
+        response = self.client.get(
+            f"/api/v1/hist-plants/{path}/{plant.id}",
+            params=params,
+            headers=self.headers,
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Cannot find plant"
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("limit", [0, settings.HIST_LIMIT_MAX + 1])
+    def test_history_limit_out_of_bounds(self, limit):
+        self.create_plants()
+        plant_id = self.db.scalars(
+            select(Plant.id).filter_by(user_id=self.user.id)
+        ).first()
+        response = self.client.get(
+            f"/api/v1/hist-plants/get-by-limit/{plant_id}",
+            params={"limit": limit, "resolution": "hour"},
+            headers=self.headers,
+        )
+        assert response.status_code == 422
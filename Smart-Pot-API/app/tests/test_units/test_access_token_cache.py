@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+import pytest
+from jose import jwt
+
+from ...core import security
+
+
+class TestAccessTokenCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        monkeypatch.setattr(security, "SECRET_KEY", "test-secret")
+        security.access_token_cache.clear()
+        self.decodes = 0
+        decode = jwt.decode
+
+        def counting_decode(*args, **kwargs):
+            self.decodes += 1
+            return decode(*args, **kwargs)
+
+        monkeypatch.setattr(security.jwt, "decode", counting_decode)
+        yield
+        security.access_token_cache.clear()
+
+    @pytest.mark.unit
+    def test_token_is_decoded_once(self):
+        token = security.create_access_token("test@example.com")
+        assert security.verify_access_token(token) == "test@example.com"
+        assert security.verify_access_token(token) == "test@example.com"
+        assert self.decodes == 1
+
+    @pytest.mark.unit
+    def test_entry_does_not_outlive_token(self):
+        token = security.create_access_token(
+            "test@example.com", expires_delta=timedelta(seconds=30)
+        )
+        security.verify_access_token(token)
+        digest = security.access_token_digest(token)
+        expires_at, _ = security.access_token_cache._entries[digest]
+        claims = security.access_token_cache.get(digest)
+        assert expires_at - security.time.monotonic() <= 30
+        assert claims["exp"] == jwt.get_unverified_claims(token)["exp"]
+
+    @pytest.mark.unit
+    def test_expired_token_is_not_cached(self):
+        token = security.create_access_token(
+            "test@example.com", expires_delta=timedelta(seconds=-1)
+        )
+        with pytest.raises(jwt.ExpiredSignatureError):
+            security.verify_access_token(token)
+        assert len(security.access_token_cache) == 0
+
+    @pytest.mark.unit
+    def test_invalid_token_is_not_cached(self):
+        token = security.create_access_token("test@example.com")
+        with pytest.raises(jwt.JWTError):
+            security.verify_access_token(token[:-2])
+        assert len(security.access_token_cache) == 0
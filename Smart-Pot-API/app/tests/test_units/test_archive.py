@@ -0,0 +1,34 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from ...core.export import encode_parquet
+from ...crud.crud_plant_hist import PLANT_HIST_COLUMNS
+from ...db.archive import LocalArchiveStorage, merge_plant_hist_archives
+
+
+def create_archive(ids):
+    rows = [(index, 20.0, 100.0, 50.0, datetime(2023, 5, index), 1) for index in ids]
+    return b"".join(encode_parquet([rows], PLANT_HIST_COLUMNS))
+
+
+class TestArchive:
+    @pytest.mark.unit
+    def test_local_archive_storage(self, tmp_path):
+        storage = LocalArchiveStorage(str(tmp_path))
+        assert storage.read("plant_1/2023-05.parquet") is None
+        storage.write("plant_1/2023-05.parquet", b"archive")
+        assert storage.read("plant_1/2023-05.parquet") == b"archive"
+        assert [path.name for path in (tmp_path / "plant_1").iterdir()] == [
+            "2023-05.parquet"
+        ]
+
+    @pytest.mark.unit
+    def test_merge_plant_hist_archives(self):
+        parquet = pytest.importorskip("pyarrow.parquet")
+        merged = merge_plant_hist_archives(
+            create_archive([1, 3, 5]), create_archive([2, 3, 4])
+        )
+        table = parquet.read_table(io.BytesIO(merged))
+        assert table.column("id").to_pylist() == [1, 2, 3, 4, 5]
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from ...core.cache import TTLCache
+
+
+class TestTTLCache:
+    @pytest.mark.unit
+    def test_get_and_set(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("token", ("ESP-1", 1))
+        assert cache.get("token") == ("ESP-1", 1)
+        assert cache.get("missing") is None
+        assert cache.stats == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    @pytest.mark.unit
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("first", 1)
+        cache.set("second", 2)
+        cache.get("first")
+        cache.set("third", 3)
+        assert cache.get("second") is None
+        assert cache.get("first") == 1
+        assert cache.get("third") == 3
+
+    @pytest.mark.unit
+    def test_entry_expires(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("token", 1, ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("token") is None
+        assert len(cache) == 0
+
+    @pytest.mark.unit
+    def test_entry_ttl_is_limited_by_cache_ttl(self):
+        cache = TTLCache(maxsize=2, ttl=0.01)
+        cache.set("token", 1, ttl=60)
+        time.sleep(0.02)
+        assert cache.get("token") is None
+
+    @pytest.mark.unit
+    def test_invalidate(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("token", 1)
+        cache.invalidate("token")
+        cache.invalidate("missing")
+        assert cache.get("token") is None
+
+    @pytest.mark.unit
+    def test_invalid_maxsize(self):
+        with pytest.raises(ValueError) as exception_info:
+            TTLCache(maxsize=0, ttl=60)
+        assert "Cache maxsize must be positive" in str(exception_info.value)
@@ -0,0 +1,12 @@
+import pytest
+
+from ...core.settings import Settings, settings
+from ...main import app
+
+
+class TestDiagnostics:
+    @pytest.mark.unit
+    def test_diagnostics_are_disabled_by_default(self):
+        assert Settings.__fields__["DIAGNOSTICS_ENABLED"].default is False
+        paths = {route.path for route in app.routes}
+        assert ("/api/v1/diagnostics/" in paths) == settings.DIAGNOSTICS_ENABLED
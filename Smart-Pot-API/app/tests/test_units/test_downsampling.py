@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from ...core.downsampling import lttb_indices
+from ...crud.crud_plant_hist import (
+    PlantHistRow,
+    downsample_plant_hist,
+    read_plant_hist_arrays,
+)
+
+
+def create_batches(count: int, batch_size: int):
+    start_at = datetime(2023, 1, 1)
+    rows = [
+        (index, 20.0, float(index), 50.0, start_at + timedelta(minutes=index), 1)
+        for index in range(count)
+    ]
+    return [rows[start : start + batch_size] for start in range(0, count, batch_size)]
+
+
+class TestDownsampling:
+    @pytest.mark.unit
+    def test_lttb_returns_all_points_when_series_is_short(self):
+        x = np.arange(10, dtype=np.float64)
+        assert np.array_equal(lttb_indices(x, x, 20), np.arange(10))
+
+    @pytest.mark.unit
+    def test_lttb_keeps_bounds_and_count(self):
+        x = np.arange(100_000, dtype=np.float64)
+        y = np.sin(x / 1000)
+        indices = lttb_indices(x, y, 1000)
+        assert len(indices) == 1000
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert np.all(np.diff(indices) > 0)
+
+    @pytest.mark.unit
+    def test_lttb_keeps_peaks(self):
+        x = np.arange(10_000, dtype=np.float64)
+        y = np.zeros_like(x)
+        y[1234], y[8765] = 50.0, -50.0
+        indices = lttb_indices(x, y, 100)
+        assert 1234 in indices
+        assert 8765 in indices
+
+    @pytest.mark.unit
+    def test_batches_are_downsampled_in_descending_order(self):
+        columns = read_plant_hist_arrays(create_batches(1000, 64), max_rows=1000)
+        rows = downsample_plant_hist(columns, plant_id=1, max_points=50)
+        assert 50 <= len(rows) <= 150
+        assert rows[0] == PlantHistRow(
+            999, 20.0, 999.0, 50.0, datetime(2023, 1, 1) + timedelta(minutes=999), 1
+        )
+        assert rows[-1].id == 0
+        assert isinstance(rows[-1].added_at, datetime)
+        assert [row.id for row in rows] == sorted(
+            (row.id for row in rows), reverse=True
+        )
+
+    @pytest.mark.unit
+    def test_short_series_is_returned_whole(self):
+        columns = read_plant_hist_arrays(create_batches(10, 4), max_rows=100)
+        rows = downsample_plant_hist(columns, plant_id=1, max_points=50)
+        assert [row.id for row in rows] == list(range(9, -1, -1))
+        empty = read_plant_hist_arrays([], max_rows=100)
+        assert downsample_plant_hist(empty, plant_id=1, max_points=50) == []
+
+    @pytest.mark.unit
+    def test_range_over_max_rows_is_refused(self):
+        with pytest.raises(HTTPException) as exception_info:
+            read_plant_hist_arrays(create_batches(101, 10), max_rows=100)
+        assert exception_info.value.status_code == 400
@@ -0,0 +1,65 @@
+import gzip
+import io
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+
+from ...core.export import export_chunks
+from ...schemas.utils.export_format import ExportFormat
+
+COLUMNS = ("id", "temperature", "added_at")
+BATCHES = [
+    [(1, 20.5, datetime(2023, 5, 1, 12)), (2, 21.0, datetime(2023, 5, 1, 13))],
+    [(3, 22.5, datetime(2023, 5, 1, 14))],
+]
+
+
+class TestExport:
+    @pytest.mark.unit
+    def test_export_ndjson(self):
+        content = b"".join(export_chunks(BATCHES, COLUMNS, ExportFormat.NDJSON))
+        rows = [orjson.loads(line) for line in content.splitlines()]
+        assert len(rows) == 3
+        assert rows[0] == {
+            "id": 1,
+            "temperature": 20.5,
+            "added_at": "2023-05-01T12:00:00+00:00",
+        }
+
+    @pytest.mark.unit
+    def test_export_csv(self):
+        content = b"".join(export_chunks(BATCHES, COLUMNS, ExportFormat.CSV))
+        assert content.decode().splitlines() == [
+            "id,temperature,added_at",
+            "1,20.5,2023-05-01 12:00:00",
+            "2,21.0,2023-05-01 13:00:00",
+            "3,22.5,2023-05-01 14:00:00",
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("export_format", list(ExportFormat))
+    def test_export_gzip(self, export_format: ExportFormat):
+        plain = b"".join(export_chunks(BATCHES, COLUMNS, export_format))
+        compressed = b"".join(export_chunks(BATCHES, COLUMNS, export_format, gzip=True))
+        assert gzip.decompress(compressed) == plain
+
+    @pytest.mark.unit
+    def test_export_parquet(self):
+        pyarrow = pytest.importorskip("pyarrow")
+        parquet = pytest.importorskip("pyarrow.parquet")
+        content = b"".join(export_chunks(BATCHES, COLUMNS, ExportFormat.PARQUET))
+        parquet_file = parquet.ParquetFile(io.BytesIO(content))
+        assert parquet_file.metadata.num_row_groups == len(BATCHES)
+        table = parquet_file.read()
+        assert table.schema.field("temperature").type == pyarrow.float32()
+        assert table.column("added_at").to_pylist()[0] == datetime(
+            2023, 5, 1, 12, tzinfo=timezone.utc
+        )
+
+    @pytest.mark.unit
+    def test_export_arrow(self):
+        pyarrow = pytest.importorskip("pyarrow")
+        content = b"".join(export_chunks(BATCHES, COLUMNS, ExportFormat.ARROW))
+        table = pyarrow.ipc.open_file(pyarrow.BufferReader(content)).read_all()
+        assert table.column("id").to_pylist() == [1, 2, 3]
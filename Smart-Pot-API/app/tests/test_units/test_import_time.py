@@ -0,0 +1,55 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+PROJECT_DIR = Path(__file__).resolve().parents[3]
+# cumulative import time of app.main, generous to stay stable on slow runners
+IMPORT_TIME_BUDGET_SECONDS = 3.0
+# loaded on first use, so cold start does not pay for them
+LAZY_MODULES = (
+    "fastapi_mail",
+    "passlib",
+    "pytz",
+    "shortuuid",
+    "numpy",
+    "pyarrow",
+    "sqlalchemy.ext.asyncio",
+)
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module loaded by import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime:
+    @pytest.fixture(scope="class")
+    def app_import_times(self) -> Dict[str, int]:
+        return import_times("app.main")
+
+    @pytest.mark.unit
+    def test_heavy_modules_are_not_imported_on_start(self, app_import_times):
+        assert [module for module in LAZY_MODULES if module in app_import_times] == []
+
+    @pytest.mark.unit
+    def test_app_import_time_is_within_budget(self, app_import_times):
+        slowest = sorted(app_import_times.items(), key=lambda item: -item[1])[:10]
+        assert (
+            app_import_times["app.main"] / 1_000_000 < IMPORT_TIME_BUDGET_SECONDS
+        ), slowest
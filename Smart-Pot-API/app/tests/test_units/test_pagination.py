@@ -0,0 +1,26 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from ...core.pagination import HistCursor, decode_cursor, encode_cursor
+
+
+class TestPagination:
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            HistCursor(datetime(2023, 5, 1, 12, 30, 15, 250), 42),
+            HistCursor(datetime(2023, 5, 1), 1, remaining=100),
+        ],
+    )
+    def test_cursor_round_trip(self, cursor: HistCursor):
+        assert decode_cursor(encode_cursor(cursor)) == cursor
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("cursor", ["not-a-cursor", "W10=", "WyJ4IiwgMSwgbnVsbF0="])
+    def test_decode_invalid_cursor(self, cursor: str):
+        with pytest.raises(HTTPException) as exception_info:
+            decode_cursor(cursor)
+        assert exception_info.value.status_code == 400
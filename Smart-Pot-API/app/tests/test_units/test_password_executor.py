@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from ...core import security
+from ...core.password_executor import PasswordExecutor, PasswordExecutorBusy
+
+
+class TestPasswordExecutor:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.executor = PasswordExecutor(max_workers=1, max_queue=1)
+        self.release = threading.Event()
+        yield
+        self.release.set()
+        self.executor.shutdown()
+
+    def block(self):
+        self.release.wait(timeout=5)
+        return "done"
+
+    def start_blocked_operations(self, count: int):
+        threads = [
+            threading.Thread(target=self.executor.run, args=(self.block,))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        # wait until operations took their worker and queue slots
+        while self.executor._slots._value:
+            time.sleep(0.001)
+        return threads
+
+    @pytest.mark.unit
+    def test_operation_returns_result(self):
+        assert self.executor.run(len, "password") == 8
+        assert self.executor.stats["completed"] == 1
+
+    @pytest.mark.unit
+    def test_operation_over_queue_size_is_rejected(self):
+        threads = self.start_blocked_operations(2)
+        with pytest.raises(PasswordExecutorBusy):
+            self.executor.run(len, "password")
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        assert self.executor.stats["rejected"] == 1
+        assert self.executor.run(len, "password") == 8
+
+    @pytest.mark.unit
+    def test_busy_executor_returns_service_unavailable(self, monkeypatch):
+        monkeypatch.setattr(security, "password_executor", self.executor)
+        threads = self.start_blocked_operations(2)
+        with pytest.raises(HTTPException) as exception_info:
+            security.get_hashed_password("password")
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        assert exception_info.value.status_code == 503
+        assert "Retry-After" in exception_info.value.headers
+
+    @pytest.mark.unit
+    def test_hash_with_other_rounds_is_updated(self, monkeypatch):
+        from passlib.context import CryptContext
+
+        monkeypatch.setattr(security, "password_executor", self.executor)
+        old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+        old_hash = old_context.hash("password")
+        monkeypatch.setattr(security.settings, "BCRYPT_ROUNDS", 5)
+        security.get_password_context.cache_clear()
+        try:
+            verified, new_hash = security.verify_and_update_password(
+                "password", old_hash
+            )
+        finally:
+            monkeypatch.undo()
+            security.get_password_context.cache_clear()
+        assert verified
+        assert new_hash.startswith("$2b$05$")
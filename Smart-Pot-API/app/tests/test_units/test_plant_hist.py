@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from ...core.responses import ORJSONUTCResponse
+from ...crud.crud_plant_hist import (
+    convert_local_datetime_to_utc,
+    plant_hist_retention_start,
+    plant_hist_to_columns,
+    rebuild_plant_hist_rollups,
+)
+
+
+class TestPlantHist:
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "local_datetime, timezone, expected",
+        [
+            (datetime(2023, 7, 1), "Europe/Warsaw", datetime(2023, 6, 30, 22)),
+            (datetime(2023, 1, 1), "Europe/Warsaw", datetime(2022, 12, 31, 23)),
+            (datetime(2023, 1, 1), "America/New_York", datetime(2023, 1, 1, 5)),
+            (datetime(2023, 1, 1), "UTC", datetime(2023, 1, 1)),
+        ],
+    )
+    def test_convert_local_datetime_to_utc(
+        self, local_datetime: datetime, timezone: str, expected: datetime
+    ):
+        assert convert_local_datetime_to_utc(local_datetime, timezone) == expected
+
+    @pytest.mark.unit
+    def test_plant_hist_to_columns(self):
+        rows = [
+            (2, 21.0, 100.0, 40.0, datetime(2023, 5, 1, 13), 1),
+            (1, 20.5, 90.0, 45.0, datetime(2023, 5, 1, 12), 1),
+        ]
+        response = ORJSONUTCResponse(plant_hist_to_columns(rows))
+        assert response.body == (
+            b'{"timestamps":["2023-05-01T13:00:00+00:00","2023-05-01T12:00:00+00:00"],'
+            b'"temperature":[21.0,20.5],"lux":[100.0,90.0],"humidity":[40.0,45.0]}'
+        )
+
+    @pytest.mark.unit
+    def test_plant_hist_to_columns_without_rows(self):
+        assert plant_hist_to_columns([]) == {
+            "timestamps": [],
+            "temperature": [],
+            "lux": [],
+            "humidity": [],
+        }
+
+    @pytest.mark.unit
+    def test_rebuild_of_archived_rollups_is_refused(self):
+        archived_month = plant_hist_retention_start(365) - timedelta(days=1)
+        with pytest.raises(ValueError) as exception_info:
+            rebuild_plant_hist_rollups(None, since=archived_month)
+        assert "archived history" in str(exception_info.value)
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from psycopg2 import IntegrityError
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from ...db import plant_hist_buffer as plant_hist_buffer_module
+from ...db.plant_hist_buffer import PlantHistBuffer, PlantHistBufferFull
+
+
+def create_rows(count: int):
+    return [
+        {
+            "temperature": 20.0,
+            "lux": 100.0,
+            "humidity": 50.0,
+            "added_at": datetime(2023, 1, 1, 0, index),
+            "plant_id": 1,
+        }
+        for index in range(count)
+    ]
+
+
+class FailingEngine:
+    def begin(self):
+        raise RuntimeError("Database is not available")
+
+
+class TestPlantHistBuffer:
+    @pytest.mark.unit
+    def test_append_and_extend(self):
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=100)
+        rows = create_rows(3)
+        buffer.append(rows[0])
+        buffer.extend(rows[1:])
+        assert buffer.queue_depth == 3
+        assert buffer.stats["queue_depth"] == 3
+
+    @pytest.mark.unit
+    def test_failed_flush_keeps_rows(self, monkeypatch):
+        monkeypatch.setattr(plant_hist_buffer_module, "engine", FailingEngine())
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=100)
+        buffer.extend(create_rows(3))
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+        assert buffer.queue_depth == 3
+        assert buffer.failed_flushes == 1
+        assert buffer._rows[0][3] == datetime(2023, 1, 1, 0, 0)
+
+    @pytest.mark.unit
+    def test_full_buffer_rejects_rows(self):
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=3)
+        buffer.extend(create_rows(2))
+        buffer.check_capacity(1)
+        with pytest.raises(PlantHistBufferFull):
+            buffer.check_capacity(2)
+
+    @pytest.mark.unit
+    def test_rows_are_queued_only_after_commit(self, monkeypatch):
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=100)
+        monkeypatch.setattr(plant_hist_buffer_module, "plant_hist_buffer", buffer)
+        with Session(create_engine("sqlite://")) as db:
+            db.execute(text("SELECT 1"))
+            buffer.extend_after_commit(db, create_rows(2))
+            assert buffer.queue_depth == 0
+            db.commit()
+            assert buffer.queue_depth == 2
+            db.execute(text("SELECT 1"))
+            buffer.extend_after_commit(db, create_rows(1))
+            db.rollback()
+            db.commit()
+        assert buffer.queue_depth == 2
+
+    @pytest.mark.unit
+    def test_refused_flush_drops_rows_of_deleted_plants(self, monkeypatch):
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=100)
+        written = []
+
+        def write(rows):
+            if any(row[4] == 2 for row in rows):
+                raise IntegrityError("plant_hist_plant_id_fkey")
+            written.extend(rows)
+
+        monkeypatch.setattr(buffer, "_write", write)
+        monkeypatch.setattr(buffer, "_existing_plant_ids", lambda plant_ids: {1})
+        rows = create_rows(3)
+        rows[1]["plant_id"] = 2
+        buffer.extend(rows)
+        assert buffer.flush() == 2
+        assert buffer.queue_depth == 0
+        assert len(written) == 2
+        assert buffer.stats["dropped_rows"] == 1
+
+    @pytest.mark.unit
+    def test_refused_flush_drops_batch_refused_again(self, monkeypatch):
+        buffer = PlantHistBuffer(flush_size=10, flush_interval=1, max_size=100)
+
+        def write(rows):
+            raise IntegrityError("plant_hist_pkey")
+
+        monkeypatch.setattr(buffer, "_write", write)
+        monkeypatch.setattr(buffer, "_existing_plant_ids", lambda plant_ids: {1})
+        buffer.extend(create_rows(3))
+        assert buffer.flush() == 0
+        assert buffer.queue_depth == 0
+        assert buffer.stats["dropped_rows"] == 3
+
+    @pytest.mark.unit
+    def test_flusher_flushes_on_size_and_stop(self, monkeypatch):
+        flushed = []
+
+        def flush():
+            while buffer._rows:
+                flushed.append(buffer._rows.popleft())
+
+        buffer = PlantHistBuffer(flush_size=2, flush_interval=60, max_size=100)
+        monkeypatch.setattr(buffer, "flush", flush)
+
+        async def run_flusher():
+            buffer.start()
+            buffer.extend(create_rows(2))
+            await asyncio.sleep(0.05)
+            assert len(flushed) == 2
+            buffer.append(create_rows(1)[0])
+            await buffer.stop()
+
+        asyncio.run(run_flusher())
+        assert len(flushed) == 3
+        assert buffer.queue_depth == 0
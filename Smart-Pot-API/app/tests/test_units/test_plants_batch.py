@@ -0,0 +1,45 @@
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+from ...crud.crud_plants import replay_plants_batch
+from ...schemas.plant import PlantBatchUpdate
+
+BatchPlant = namedtuple(
+    "BatchPlant",
+    "id temperature lux humidity last_updated device_id device_token",
+)
+
+
+class TestPlantsBatch:
+    @pytest.mark.unit
+    def test_replay_readings_with_offset(self):
+        db_plant = BatchPlant(1, 0.0, 0.0, 0.0, datetime(2024, 1, 1), "ESP-1", "token")
+        plants_batch = PlantBatchUpdate(
+            devices=[
+                {
+                    "device_token": "token",
+                    "readings": [
+                        {
+                            "sensors": {"humidity": 2, "lux": 2, "temperature": 2},
+                            "last_updated": "2024-01-01T03:00:00+01:00",
+                        },
+                        {
+                            "sensors": {"humidity": 1, "lux": 1, "temperature": 1},
+                            "last_updated": "2024-01-01T01:00:00Z",
+                        },
+                    ],
+                }
+            ]
+        )
+        readings_by_token = {
+            device.device_token: device.readings for device in plants_batch.devices
+        }
+        history_rows, latest_rows = replay_plants_batch(readings_by_token, [db_plant])
+        assert [row["added_at"] for row in history_rows] == [
+            datetime(2024, 1, 1),
+            datetime(2024, 1, 1, 1),
+        ]
+        assert latest_rows[0]["last_updated"] == datetime(2024, 1, 1, 2)
+        assert latest_rows[0]["temperature"] == 2
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from ...db.pool import PoolStats, instrumented_pool_class, pool_status
+
+
+class TestPool:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.stats = PoolStats()
+        self.engine = create_engine(
+            "sqlite://",
+            poolclass=instrumented_pool_class(QueuePool, self.stats),
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.01,
+        )
+
+    @pytest.mark.unit
+    def test_pool_counts_checkouts(self):
+        for _ in range(3):
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        status = pool_status(self.engine, self.stats)
+        assert status["checkouts"] == 3
+        assert status["timeouts"] == 0
+        assert status["size"] == 1
+        assert status["checked_out"] == 0
+
+    @pytest.mark.unit
+    def test_pool_counts_timeouts(self):
+        with self.engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                self.engine.connect()
+        status = pool_status(self.engine, self.stats)
+        assert status["timeouts"] == 1
+        assert status["max_wait_seconds"] >= 0.01
+
+    @pytest.mark.unit
+    def test_pool_stats_survive_dispose(self):
+        with self.engine.connect():
+            pass
+        self.engine.dispose()
+        with self.engine.connect():
+            pass
+        assert pool_status(self.engine, self.stats)["checkouts"] == 2
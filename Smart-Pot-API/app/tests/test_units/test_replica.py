@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+
+from ...db.replica import ReplicaLagMonitor
+
+
+class TestReplicaLagMonitor:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.lags = []
+        self.monitor = ReplicaLagMonitor(
+            create_engine("sqlite://"), max_lag=10.0, check_interval=60.0
+        )
+        self.monitor.fetch_lag = self.fetch_lag
+
+    def fetch_lag(self):
+        lag = self.lags.pop(0)
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    @pytest.mark.unit
+    def test_replica_is_fresh_below_max_lag(self):
+        self.lags = [0.5]
+        assert self.monitor.is_fresh()
+        assert self.monitor.stats["lag_seconds"] == 0.5
+
+    @pytest.mark.unit
+    def test_lag_is_cached_for_check_interval(self):
+        self.lags = [0.5, 60.0]
+        assert self.monitor.is_fresh()
+        assert self.monitor.is_fresh()
+        assert self.lags == [60.0]
+
+    @pytest.mark.unit
+    def test_stale_replica_falls_back_to_primary(self):
+        self.lags = [60.0]
+        assert not self.monitor.is_fresh()
+        assert self.monitor.stats["fallbacks"] == 1
+
+    @pytest.mark.unit
+    def test_failed_check_falls_back_to_primary(self):
+        self.monitor.check_interval = 0
+        self.lags = [ConnectionError("replica is down"), 0.5]
+        assert not self.monitor.is_fresh()
+        assert self.monitor.is_fresh()
+
+    @pytest.mark.unit
+    def test_slow_check_does_not_block_other_requests(self):
+        self.monitor.check_interval = 0
+        self.lags = [0.5]
+        assert self.monitor.is_fresh()
+        check_started = threading.Event()
+        release_check = threading.Event()
+
+        def slow_fetch_lag():
+            check_started.set()
+            release_check.wait(timeout=5)
+            return 60.0
+
+        self.monitor.fetch_lag = slow_fetch_lag
+        checking_thread = threading.Thread(target=self.monitor.is_fresh)
+        checking_thread.start()
+        check_started.wait(timeout=5)
+        # last known lag is used while the check runs
+        assert self.monitor.is_fresh()
+        release_check.set()
+        checking_thread.join()
+        assert self.monitor.stats["lag_seconds"] == 60.0
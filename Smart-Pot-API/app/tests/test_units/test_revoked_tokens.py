@@ -0,0 +1,36 @@
+import pytest
+
+from ...crud.crud_token import RevokedTokens
+
+
+class TestRevokedTokens:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.loads = 0
+        self.blacklist = {"destroyed"}
+        self.revoked_tokens = RevokedTokens(refresh_interval=60.0)
+        self.revoked_tokens._load = self.load
+
+    def load(self, db):
+        self.loads += 1
+        return set(self.blacklist)
+
+    @pytest.mark.unit
+    def test_blacklist_is_loaded_once_per_interval(self):
+        assert self.revoked_tokens.is_revoked(None, "destroyed")
+        assert not self.revoked_tokens.is_revoked(None, "valid")
+        assert self.loads == 1
+
+    @pytest.mark.unit
+    def test_blacklist_is_reloaded_after_interval(self):
+        self.revoked_tokens.refresh_interval = 0
+        assert not self.revoked_tokens.is_revoked(None, "other_worker")
+        self.blacklist.add("other_worker")
+        assert self.revoked_tokens.is_revoked(None, "other_worker")
+
+    @pytest.mark.unit
+    def test_added_token_is_revoked_immediately(self):
+        self.revoked_tokens.is_revoked(None, "valid")
+        self.revoked_tokens.add("valid")
+        assert self.revoked_tokens.is_revoked(None, "valid")
+        assert self.loads == 1
@@ -0,0 +1,130 @@
+"""Rows/sec and peak memory of plant history reads, ORM objects vs plain rows
+
+Compares loading history as ORM instances, like before the Core read path, with
+`get_user_historical_plant_data_limit`, which returns plain rows. Both are
+serialized with the PlantHist response model. Needs running Postgres, by
+default the test database from settings. All its tables are dropped, so --drop
+has to confirm it is a scratch database:
+
+    python -m benchmarks.bench_hist_reads --rows 100000 --drop
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.crud.crud_plants import get_user_historical_plant_data_limit
+from app.db.base import Base
+from app.models.device import Device
+from app.models.plant import Plant, Plant_Hist
+from app.models.sensor_threshold import SensorThreshold  # noqa: F401
+from app.models.user import User
+from app.schemas.plant import PlantHist
+
+from .database import add_database_arguments, parse_database_arguments
+
+
+def orm_historical_plant_data_limit(db: Session, plant_id: int, limit: int):
+    """History read as it was before the Core read path"""
+    return (
+        db.query(Plant_Hist)
+        .filter(Plant_Hist.plant_id == plant_id)
+        .order_by(Plant_Hist.added_at.desc(), Plant_Hist.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def seed(db: Session, rows: int) -> int:
+    user = User(full_name="Benchmark", email="bench@example.com", hashed_password="-")
+    db.add(user)
+    db.flush()
+    db.add(
+        Device(
+            id="ESP-bench",
+            name="bench",
+            type="ESP",
+            user_id=user.id,
+            device_token="benchmarkToken1",
+        )
+    )
+    plant = Plant(
+        name="bench",
+        imgsrc="",
+        humidity=0.0,
+        lux=0.0,
+        temperature=0.0,
+        last_updated=datetime(2023, 1, 1),
+        device_id="ESP-bench",
+        user_id=user.id,
+    )
+    db.add(plant)
+    db.flush()
+    started_at = datetime(2023, 1, 1)
+    db.execute(
+        insert(Plant_Hist),
+        [
+            {
+                "temperature": 20.0,
+                "lux": float(index % 1000),
+                "humidity": 50.0,
+                "added_at": started_at + timedelta(minutes=index),
+                "plant_id": plant.id,
+            }
+            for index in range(rows)
+        ],
+    )
+    db.commit()
+    return plant.id
+
+
+def read_response(engine, read, plant_id: int, rows: int):
+    with Session(engine) as db:
+        # serialize the response like the endpoint does
+        response = [PlantHist.from_orm(row) for row in read(db, plant_id, rows)]
+    assert len(response) == rows
+
+
+def run(engine, read, plant_id: int, rows: int, repeats: int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        read_response(engine, read, plant_id, rows)
+    elapsed = time.perf_counter() - start
+    # memory is traced in separate run, tracing slows down the timed ones
+    tracemalloc.start()
+    read_response(engine, read, plant_id, rows)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows * repeats / elapsed, peak_memory / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(parser)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parse_database_arguments(parser)
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        plant_id = seed(db, args.rows)
+
+    print(f"{'path':<10}{'rows/sec':>14}{'peak MiB':>12}")
+    for name, read in (
+        ("orm", orm_historical_plant_data_limit),
+        ("core", get_user_historical_plant_data_limit),
+    ):
+        rows_per_second, peak_memory = run(
+            engine, read, plant_id, args.rows, args.repeats
+        )
+        print(f"{name:<10}{rows_per_second:>14.0f}{peak_memory:>12.1f}")
+    Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
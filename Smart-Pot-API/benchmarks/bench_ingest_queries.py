@@ -0,0 +1,132 @@
+"""Queries per reading of the device ingest path (PATCH /api/v1/plants/update-plant)
+
+Compares the ingest path from before the single statement rework with the current
+`update_plant`. Needs running Postgres, by default the test database from settings.
+All its tables are dropped, so --drop has to confirm it is a scratch database:
+
+    python -m benchmarks.bench_ingest_queries --readings 200 --drop
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app.crud.crud_devices import get_device_by_token
+from app.crud.crud_plants import get_plant_by_device_token, update_plant
+from app.db.base import Base
+from app.models.device import Device
+from app.models.plant import Plant, Plant_Hist
+from app.models.sensor_threshold import SensorThreshold  # noqa: F401
+from app.models.user import User
+from app.schemas.plant import Plant as PlantSchema
+from app.schemas.plant import PlantUpdate
+
+from .database import add_database_arguments, parse_database_arguments
+
+DEVICE_TOKEN = "benchmarkToken1"
+
+
+def legacy_update_plant(db: Session, updated_plant: PlantUpdate) -> Plant:
+    """Ingest path as it was before the single statement rework"""
+    get_device_by_token(db, updated_plant.device_token)
+    db_plant = get_plant_by_device_token(db, device_token=updated_plant.device_token)
+    assert db_plant.device.device_token == updated_plant.device_token
+    # history row saved like save_plant_history_data did then, without rollups
+    plant_hist = Plant_Hist(
+        temperature=db_plant.temperature,
+        lux=db_plant.lux,
+        humidity=db_plant.humidity,
+        added_at=db_plant.last_updated,
+        plant_id=db_plant.id,
+    )
+    db.add(plant_hist)
+    db.commit()
+    db.refresh(plant_hist)
+    plant_data = updated_plant.dict(exclude_unset=True)
+    for key, value in plant_data.items():
+        if key == "sensors":
+            for sensor_key, sensor_value in value.items():
+                setattr(db_plant, sensor_key, sensor_value)
+        setattr(db_plant, key, value)
+    db.add(db_plant)
+    db.commit()
+    db.refresh(db_plant)
+    return db_plant
+
+
+def seed(db: Session) -> None:
+    user = User(full_name="Benchmark", email="bench@example.com", hashed_password="-")
+    db.add(user)
+    db.flush()
+    db.add(
+        Device(
+            id="ESP-bench",
+            name="bench",
+            type="ESP",
+            user_id=user.id,
+            device_token=DEVICE_TOKEN,
+        )
+    )
+    db.add(
+        Plant(
+            name="bench",
+            imgsrc="",
+            humidity=0.0,
+            lux=0.0,
+            temperature=0.0,
+            last_updated=datetime(2023, 1, 1),
+            device_id="ESP-bench",
+            user_id=user.id,
+        )
+    )
+    db.commit()
+
+
+def run(engine, ingest, readings: int):
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    started_at = datetime(2023, 1, 1)
+    event.listen(engine, "before_cursor_execute", count_statement)
+    start = time.perf_counter()
+    for index in range(readings):
+        with Session(engine, autoflush=False) as db:
+            updated_plant = PlantUpdate(
+                sensors={"humidity": index, "lux": index, "temperature": 20.0},
+                device_token=DEVICE_TOKEN,
+                last_updated=started_at + timedelta(minutes=index + 1),
+            )
+            # serialize the response like the endpoint does
+            PlantSchema.from_orm(ingest(db, updated_plant))
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", count_statement)
+    return len(statements) / readings, elapsed / readings * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_database_arguments(parser)
+    parser.add_argument("--readings", type=int, default=200)
+    args = parse_database_arguments(parser)
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        seed(db)
+
+    print(f"{'path':<10}{'queries/reading':>18}{'ms/reading':>14}")
+    for name, ingest in (("legacy", legacy_update_plant), ("current", update_plant)):
+        queries, milliseconds = run(engine, ingest, args.readings)
+        print(f"{name:<10}{queries:>18.1f}{milliseconds:>14.2f}")
+    with Session(engine) as db:
+        assert db.query(Plant_Hist).count() == 2 * args.readings
+    Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Logins/sec of password verification vs bcrypt rounds
+
+Runs `verify_and_update_password`, the bcrypt part of `/token`, from concurrent
+client threads through the password executor, like worker threads of the
+shared threadpool do. Verifications rejected with 503, because the executor
+queue was full, are counted separately. Database and JWT work of the login is
+a few milliseconds and is left out. Doesn't need database:
+
+    python -m benchmarks.bench_login_throughput --rounds 10 11 12 --clients 40
+"""
+import argparse
+import threading
+import time
+
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.password_executor import PasswordExecutor
+
+
+def run(hashed_password: str, clients: int, logins: int):
+    succeeded = 0
+    rejected = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal succeeded, rejected
+        for _ in range(logins):
+            try:
+                verified, _ = security.verify_and_update_password(
+                    "benchmark-password", hashed_password
+                )
+                assert verified
+                result = "succeeded"
+            except HTTPException:
+                result = "rejected"
+            with lock:
+                if result == "succeeded":
+                    succeeded += 1
+                else:
+                    rejected += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return succeeded / elapsed, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--logins", type=int, default=5, help="per client")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'rounds':<8}{'logins/sec':>12}{'rejected':>10}")
+    for rounds in args.rounds:
+        security.settings.BCRYPT_ROUNDS = rounds
+        security.get_password_context.cache_clear()
+        security.password_executor = PasswordExecutor(
+            max_workers=args.workers, max_queue=args.queue_size
+        )
+        hashed_password = security.get_hashed_password("benchmark-password")
+        logins_per_second, rejected = run(hashed_password, args.clients, args.logins)
+        security.password_executor.shutdown()
+        print(f"{rounds:<8}{logins_per_second:>12.1f}{rejected:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Command line options of benchmarks which recreate tables of a database"""
+import argparse
+
+from app.core.settings import settings
+
+
+def add_database_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database-url", default=settings.TEST_DATABASE_URL)
+    parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="confirm that all tables of --database-url are dropped, "
+        "use scratch database only",
+    )
+
+
+def parse_database_arguments(parser: argparse.ArgumentParser) -> argparse.Namespace:
+    args = parser.parse_args()
+    if not args.drop:
+        parser.error(
+            "all tables of --database-url are dropped before and after the run, "
+            "pass --drop to confirm it is a scratch database"
+        )
+    return args